@@ -0,0 +1,218 @@
+"""Headless HTTP scoring service for the heart risk model.
+
+Run with:
+
+    uvicorn api:app --host 0.0.0.0 --port 8000 --workers 4
+
+Endpoints:
+    GET  /health         -> {"status": "ok", "model_version": ..., "microbatch": {...}}
+    POST /predict        -> score one patient record
+    POST /predict/batch  -> score {"records": [...]}; a record that cannot be
+                            scored comes back as "Invalid Input" with the
+                            reason in "error", as in score_records.py
+
+Concurrent /predict calls are coalesced by heart_core.MicroBatcher.
+HEART_MICROBATCH=0 scores each call inline instead, and
+HEART_MICROBATCH_WAIT_MS holds batches open for extra requests.
+Changed model artifacts are picked up without a restart (see
+heart_core.ModelRegistry); HEART_MODEL_POLL_SECONDS=0 turns that off.
+"""
+import asyncio
+import json
+import os
+
+import pandas as pd
+
+import heart_core
+from heart_core import INPUT_FEATURES, get_risk_category, record_error, validate_inputs
+
+MAX_BODY_BYTES = 8 * 1024 * 1024
+MAX_BATCH_ROWS = 50000
+# Batches larger than this are scored off the event loop
+INLINE_BATCH_ROWS = 256
+
+# Route /predict through the shared MicroBatcher instead of scoring inline
+MICROBATCH_ENABLED = os.environ.get("HEART_MICROBATCH", "1") != "0"
+MICROBATCH_MAX_BATCH = 64
+MICROBATCH_MAX_WAIT_MS = float(os.environ.get("HEART_MICROBATCH_WAIT_MS", "0"))
+
+# Seconds between checks for new model artifacts (0 disables hot reload)
+MODEL_POLL_SECONDS = float(os.environ.get("HEART_MODEL_POLL_SECONDS", "2"))
+
+registry = None
+batcher = None
+
+
+def get_registry():
+    global registry
+    if registry is None:
+        registry = heart_core.ModelRegistry(poll_interval=MODEL_POLL_SECONDS)
+    return registry
+
+
+def get_model():
+    """The model current right now; hold on to it for the rest of the request"""
+    return get_registry().current
+
+
+def get_batcher():
+    global batcher
+    if batcher is None:
+        batcher = heart_core.MicroBatcher(
+            get_model, max_batch=MICROBATCH_MAX_BATCH, max_wait_ms=MICROBATCH_MAX_WAIT_MS
+        )
+    return batcher
+
+
+# ------------------------ SCORING ------------------------ #
+def check_record(record):
+    """Reject records that cannot be scored (heart_core.record_error)"""
+    error = record_error(record)
+    if error is not None:
+        raise ValueError(error)
+
+
+def build_result(record, prediction, risk_score, model_version):
+    risk_label, risk_class, _ = get_risk_category(risk_score, prediction)
+    return {
+        "risk_score": risk_score,
+        "prediction": prediction,
+        "risk_category": risk_label,
+        "risk_class": risk_class,
+        "model_version": model_version,
+        "warnings": validate_inputs(
+            record['Age'], record['RestingBP'], record['Cholesterol'], record['MaxHR']
+        ),
+    }
+
+
+async def predict_one(record):
+    check_record(record)
+    if MICROBATCH_ENABLED:
+        prediction, risk_score, model_version = await get_batcher().submit(record, asyncio.get_running_loop())
+    else:
+        heart_model = get_model()
+        prediction, risk_score = heart_model.score(record)
+        model_version = heart_model.version
+    return build_result(record, prediction, risk_score, model_version)
+
+
+def predict_batch(records):
+    if not isinstance(records, list):
+        raise ValueError("Body must be {\"records\": [...]}")
+    if len(records) > MAX_BATCH_ROWS:
+        raise ValueError(f"At most {MAX_BATCH_ROWS} records per batch")
+    errors = [record_error(record) for record in records]
+    valid = [record for record, error in zip(records, errors) if error is None]
+
+    heart_model = get_model()
+    scores = iter(())
+    if valid:
+        df = heart_model.score_frame(pd.DataFrame.from_records(valid, columns=INPUT_FEATURES))
+        scores = zip(df['prediction'].tolist(), df['risk_score'].tolist())
+    results = []
+    for record, error in zip(records, errors):
+        if error is not None:
+            results.append({
+                "risk_score": None,
+                "prediction": -1,
+                "risk_category": "Invalid Input",
+                "risk_class": None,
+                "model_version": heart_model.version,
+                "warnings": [],
+                "error": error,
+            })
+            continue
+        prediction, risk_score = next(scores)
+        results.append({**build_result(record, prediction, risk_score, heart_model.version), "error": None})
+    return results
+
+
+# ------------------------ ASGI APP ------------------------ #
+async def read_body(receive):
+    body = bytearray()
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+        if len(body) > MAX_BODY_BYTES:
+            raise OverflowError
+        if not message.get('more_body', False):
+            return bytes(body)
+
+
+async def send_json(send, status, payload):
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode()),
+        ],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            try:
+                get_batcher()
+            except Exception as e:
+                await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                return
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+
+    path, method = scope['path'].rstrip('/') or '/', scope['method']
+    if path == '/health':
+        model_registry = get_registry()
+        await send_json(send, 200, {
+            "status": "ok",
+            "model_version": model_registry.current.version,
+            "model_reloads": model_registry.reloads,
+            "model_reload_error": model_registry.last_error,
+            "microbatch": get_batcher().stats(),
+        })
+        return
+    if path not in ('/predict', '/predict/batch'):
+        await send_json(send, 404, {"error": "Not found"})
+        return
+    if method != 'POST':
+        await send_json(send, 405, {"error": "Use POST"})
+        return
+
+    try:
+        payload = json.loads(await read_body(receive))
+    except OverflowError:
+        await send_json(send, 413, {"error": "Request body too large"})
+        return
+    except ValueError:
+        await send_json(send, 400, {"error": "Body must be valid JSON"})
+        return
+
+    try:
+        if path == '/predict':
+            result = await predict_one(payload)
+        else:
+            records = payload.get('records') if isinstance(payload, dict) else None
+            if isinstance(records, list) and len(records) > INLINE_BATCH_ROWS:
+                result = {"results": await asyncio.to_thread(predict_batch, records)}
+            else:
+                result = {"results": predict_batch(records)}
+    except (ValueError, TypeError) as e:
+        await send_json(send, 422, {"error": str(e)})
+        return
+
+    await send_json(send, 200, result)
@@ -1,23 +1,31 @@
+import functools
+import hashlib
+import os
 import streamlit as st
 import pandas as pd
-import joblib
+import tempfile
 import time
-from datetime import datetime
-
-# Optional PDF support
-try:
-    from fpdf import FPDF
-    PDF_AVAILABLE = True
-except ImportError:
-    PDF_AVAILABLE = False
-
-import plotly.graph_objects as go
-
-# Constants
-AGE_MIN, AGE_MAX, AGE_DEFAULT = 18, 100, 40
-BP_MIN, BP_MAX, BP_DEFAULT = 80, 200, 120
-CHOL_MIN, CHOL_MAX, CHOL_DEFAULT = 100, 600, 200
-HR_MIN, HR_MAX, HR_DEFAULT = 60, 220, 150
+import uuid
+from datetime import datetime, timedelta
+
+from heart_core import (
+    AGE_MIN, AGE_MAX, AGE_DEFAULT,
+    BP_MIN, BP_MAX, BP_DEFAULT,
+    CHOL_MIN, CHOL_MAX, CHOL_DEFAULT,
+    HR_MIN, HR_MAX, HR_DEFAULT,
+    OLDPEAK_MIN, OLDPEAK_MAX, OLDPEAK_DEFAULT,
+    HIGH_RISK_THRESHOLD, PARQUET_AVAILABLE,
+    CATEGORY_LEVELS, COHORT_GROUP_FEATURES, FEATURE_LABELS, INPUT_FEATURES, SWEEP_RANGES,
+    CohortAggregator, Debouncer, StageTimer, TimingStats,
+    get_health_levels, get_risk_category, input_key, score_csv, score_live, score_parquet, sweep_values,
+    validate_inputs,
+)
+import heart_core
+from history import HistoryStore, PredictionHistory
+# Optional PDF support; fpdf and plotly are imported where first used to keep cold start fast
+from reports import (
+    PDF_AVAILABLE, PredictionReport, build_report_fields, export_reports, get_pdf_template,
+)
 
 # ------------------------ PAGE CONFIG ------------------------ #
 st.set_page_config(
@@ -28,345 +36,104 @@ st.set_page_config(
 
 # ------------------------ SESSION STATE ------------------------ #
 if 'prediction_history' not in st.session_state:
-    st.session_state.prediction_history = []
+    st.session_state.prediction_history = PredictionHistory()
+if 'live_debouncer' not in st.session_state:
+    st.session_state.live_debouncer = Debouncer()
 
 # ------------------------ CUSTOM CSS ------------------------ #
-st.markdown("""
-<style>
-@import url('https://fonts.googleapis.com/css2?family=Poppins:wght@300;400;500;600;700;800&display=swap');
-
-html, body, [class*="css"] {
-    font-family: 'Poppins', sans-serif;
-}
-
-.stApp {
-    background: radial-gradient(circle at top left, #0a0e27 0%, #020617 35%, #0f172a 100%);
-    color: #f1f5f9;
-}
-
-@keyframes fadeInUp {
-    from { opacity: 0; transform: translate3d(0, 20px, 0); }
-    to { opacity: 1; transform: translate3d(0, 0, 0); }
-}
-
-@keyframes glowRing {
-    0% { box-shadow: 0 0 0 0 rgba(248, 113, 113, 0.3); }
-    50% { box-shadow: 0 0 20px 15px rgba(248, 113, 113, 0.08); }
-    100% { box-shadow: 0 0 0 0 rgba(248, 113, 113, 0.0); }
-}
-
-@keyframes pulse {
-    0%, 100% { transform: scale(1); }
-    50% { transform: scale(1.05); }
-}
-
-.hero-wrapper {
-    display: flex;
-    align-items: center;
-    justify-content: space-between;
-    gap: 2rem;
-    padding: 1.5rem 0 0.5rem 0;
-    animation: fadeInUp 0.6s ease-out;
-}
-
-.hero-text {
-    max-width: 60%;
-}
-
-.hero-pill {
-    display: inline-flex;
-    align-items: center;
-    gap: 0.35rem;
-    font-size: 0.8rem;
-    padding: 0.35rem 1rem;
-    border-radius: 999px;
-    background: linear-gradient(90deg, rgba(56,189,248,0.25), rgba(168,85,247,0.3));
-    border: 1px solid rgba(125,211,252,0.8);
-    color: #bae6fd;
-    box-shadow: 0 4px 12px rgba(56,189,248,0.2);
-}
-
-.hero-title {
-    font-size: 3rem;
-    font-weight: 800;
-    line-height: 1.15;
-    margin-top: 0.8rem;
-    background: linear-gradient(135deg, #f97316, #fb7185, #a855f7, #38bdf8);
-    -webkit-background-clip: text;
-    -webkit-text-fill-color: transparent;
-    background-clip: text;
-}
-
-.hero-subtitle {
-    font-size: 1rem;
-    color: #cbd5e1;
-    margin-top: 0.6rem;
-    line-height: 1.6;
-}
-
-.hero-highlight {
-    color: #f97316;
-    font-weight: 700;
-}
-
-.hero-right {
-    flex: 1;
-    display: flex;
-    justify-content: center;
-}
-
-.heart-orbit {
-    position: relative;
-    width: 220px;
-    height: 220px;
-    border-radius: 999px;
-    background: radial-gradient(circle at 30% 20%, #f97316, transparent 60%),
-                radial-gradient(circle at 70% 80%, #ec4899, transparent 55%);
-    animation: glowRing 2.8s infinite ease-out;
-    display: flex;
-    align-items: center;
-    justify-content: center;
-}
-
-.heart-inner {
-    width: 160px;
-    height: 160px;
-    border-radius: 999px;
-    background: rgba(10,14,39,0.98);
-    border: 1px solid rgba(248,250,252,0.2);
-    box-shadow: 0 20px 50px rgba(0,0,0,0.9);
-    display: flex;
-    flex-direction: column;
-    align-items: center;
-    justify-content: center;
-    animation: pulse 3s infinite ease-in-out;
-}
-
-.heart-emoji {
-    font-size: 2.8rem;
-}
-
-.heart-label {
-    margin-top: 0.4rem;
-    font-size: 0.85rem;
-    color: #f1f5f9;
-    font-weight: 600;
-}
-
-.heart-pulse {
-    font-size: 0.72rem;
-    color: #22c55e;
-    margin-top: 0.2rem;
-}
-
-.section-card {
-    background: rgba(15, 23, 42, 0.7);
-    backdrop-filter: blur(12px);
-    border: 1px solid rgba(148, 163, 184, 0.25);
-    border-radius: 1.2rem;
-    padding: 1.5rem;
-    margin-bottom: 1.2rem;
-    transition: all 0.3s ease;
-}
-
-.section-card:hover {
-    border-color: rgba(148, 163, 184, 0.4);
-    transform: translateY(-2px);
-    box-shadow: 0 8px 24px rgba(0,0,0,0.3);
-}
-
-.section-header {
-    font-weight: 700;
-    font-size: 1.1rem;
-    margin-bottom: 0.5rem;
-    display: flex;
-    align-items: center;
-    gap: 0.5rem;
-}
-
-.section-header span.icon {
-    font-size: 1.3rem;
-}
-
-.section-header span.text-gradient-pink-green {
-    background: linear-gradient(90deg,#fb7185,#22c55e);
-    -webkit-background-clip:text;
-    -webkit-text-fill-color: transparent;
-}
-
-.section-header span.text-gradient-blue-pink {
-    background: linear-gradient(90deg,#38bdf8,#ec4899);
-    -webkit-background-clip:text;
-    -webkit-text-fill-color: transparent;
-}
+# The theme is a static file (server.enableStaticServing), so the browser
+# fetches it once and every rerun only re-sends this one-line <link>.
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
 
-.section-header span.text-gradient-pink-blue {
-    background: linear-gradient(90deg,#fb7185,#38bdf8);
-    -webkit-background-clip:text;
-    -webkit-text-fill-color: transparent;
-}
-
-.section-header span.text-gradient-green-orange {
-    background: linear-gradient(90deg,#22c55e,#f97316);
-    -webkit-background-clip:text;
-    -webkit-text-fill-color: transparent;
-}
-
-.gradient-line-pink-green {
-    border:0;
-    height:2px;
-    background:linear-gradient(90deg,#fb7185,#22c55e,#38bdf8);
-    opacity:0.8;
-    margin-bottom:0.8rem;
-}
-
-.gradient-line-blue-pink {
-    border:0;
-    height:2px;
-    background:linear-gradient(90deg,#38bdf8,#ec4899,#8b5cf6);
-    opacity:0.8;
-    margin-bottom:0.8rem;
-}
+@st.cache_resource
+def get_theme_url():
+    with open(os.path.join(STATIC_DIR, "theme.css"), "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()[:12]
+    return f"./app/static/theme.css?v={digest}"
 
-.gradient-line-pink-blue {
-    border:0;
-    height:2px;
-    background:linear-gradient(90deg,#fb7185,#38bdf8,#22c55e);
-    opacity:0.8;
-    margin-bottom:0.8rem;
-}
+st.markdown(f'<link rel="stylesheet" href="{get_theme_url()}">', unsafe_allow_html=True)
 
-.stSlider label, .stSelectbox label, .stNumberInput label {
-    font-weight: 600 !important;
-    font-size: 0.92rem !important;
-    color: #e2e8f0 !important;
-}
+# ------------------------ LOAD ARTIFACTS ------------------------ #
+@st.cache_resource
+def get_registry(_timer=None):
+    try:
+        return heart_core.ModelRegistry(timer=_timer)
+    except FileNotFoundError as e:
+        st.error("❌ Model files not found. Please ensure Heart_model.bundle (or Heart_LR.pkl, Heart_scaler.pkl, and Heart_column.pkl) is in the same directory.")
+        st.info("📁 Missing file: " + str(e))
+        st.stop()
+    except Exception as e:
+        st.error(f"❌ Error loading model files: {str(e)}")
+        st.stop()
 
-.stSlider > div > div, .stSelectbox > div, .stNumberInput > div > div {
-    background: rgba(15, 23, 42, 0.85) !important;
-    border-radius: 0.75rem !important;
-    border: 1px solid rgba(148, 163, 184, 0.2) !important;
-    transition: all 0.3s ease !important;
-}
+# Per-run stage timings, shown with ?debug=1
+script_start = time.perf_counter()
+run_timer = StageTimer()
+DEBUG_TIMINGS = st.query_params.get("debug") == "1"
 
-.stSlider > div > div:hover, .stSelectbox > div:hover, .stNumberInput > div > div:hover {
-    border-color: rgba(148, 163, 184, 0.4) !important;
-    transform: translateY(-1px);
-}
+model_registry = get_registry(run_timer)
+# One model per script run, so a hot swap never mixes versions within a prediction
+heart_model = model_registry.current
 
-.stButton>button {
-    width: 100%;
-    border-radius: 999px;
-    border: 0;
-    padding: 1rem 1.5rem;
-    font-weight: 700;
-    font-size: 1rem;
-    letter-spacing: 0.05em;
-    background: linear-gradient(135deg, #f97316, #ec4899, #8b5cf6);
-    background-size: 200% 200%;
-    color: white;
-    box-shadow: 0 20px 45px rgba(236, 72, 153, 0.4);
-    transition: all 0.3s ease-in-out;
-    animation: gradientShift 3s ease infinite;
-}
 
-.stButton>button:hover {
-    transform: translateY(-3px) scale(1.02);
-    box-shadow: 0 25px 55px rgba(236, 72, 153, 0.6);
-}
+@st.cache_resource
+def get_timing_stats():
+    return TimingStats()
 
-@keyframes gradientShift {
-    0%, 100% { background-position: 0% 50%; }
-    50% { background-position: 100% 50%; }
-}
 
-.stMetric {
-    background: rgba(15, 23, 42, 0.9);
-    padding: 1rem 1.2rem;
-    border-radius: 1.2rem;
-    border: 1px solid rgba(148, 163, 184, 0.3);
-    box-shadow: 0 4px 12px rgba(0,0,0,0.2);
-}
+# Predictions and rendered reports per input, shared by all sessions (HEART_RESULT_CACHE_BYTES)
+@st.cache_resource
+def get_result_cache():
+    return heart_core.ResultCache()
 
-.risk-badge {
-    display: inline-flex;
-    align-items: center;
-    gap: 0.4rem;
-    padding: 0.4rem 1rem;
-    border-radius: 999px;
-    font-size: 0.9rem;
-    font-weight: 700;
-    box-shadow: 0 4px 12px rgba(0,0,0,0.3);
-}
 
-.risk-badge.low {
-    background: rgba(22,163,74,0.2);
-    color: #4ade80;
-    border: 1px solid rgba(74,222,128,0.6);
-}
+# Reference cohort the risk is ranked against (HEART_REFERENCE_COHORT); rebuilt when the model changes
+@st.cache_resource
+def get_reference_population():
+    return heart_core.ReferencePopulation()
 
-.risk-badge.moderate {
-    background: rgba(234,179,8,0.2);
-    color: #facc15;
-    border: 1px solid rgba(250,204,21,0.6);
-}
 
-.risk-badge.high {
-    background: rgba(239,68,68,0.2);
-    color: #fca5a5;
-    border: 1px solid rgba(248,113,113,0.7);
-}
+def population_caption(percentile):
+    if percentile is not None:
+        st.caption(f"📊 Higher than {percentile:.0f}% of the reference population")
 
-@media (max-width: 768px) {
-    .hero-title {
-        font-size: 2rem !important;
-    }
-    .hero-wrapper {
-        flex-direction: column;
-    }
-    .hero-text {
-        max-width: 100%;
-    }
-}
-</style>
-""", unsafe_allow_html=True)
+# Optional durable history, shared across refreshes and replicas
+HISTORY_DB = os.environ.get("HEART_HISTORY_DB")
 
-# ------------------------ LOAD ARTIFACTS ------------------------ #
 @st.cache_resource
-def load_artifacts():
-    try:
-        model = joblib.load("Heart_LR.pkl")
-        scaler = joblib.load("Heart_scaler.pkl")
-        expected_columns = joblib.load("Heart_column.pkl")
-        return model, scaler, expected_columns
-    except FileNotFoundError as e:
-        st.error("❌ Model files not found. Please ensure Heart_LR.pkl, Heart_scaler.pkl, and Heart_column.pkl are in the same directory.")
-        st.info("📁 Missing file: " + str(e))
-        st.stop()
-    except Exception as e:
-        st.error(f"❌ Error loading model files: {str(e)}")
-        st.stop()
+def get_history_store(path):
+    return HistoryStore(path)
+
+# The device id is a bearer token: whoever holds it can read and add to that
+# history. It is kept in a first-party cookie (never in the URL, where it would
+# leak through shared links, bookmarks and logs) and there is no login behind
+# it, so only enable HEART_HISTORY_DB where that is acceptable.
+DEVICE_COOKIE = "heart_device"
+DEVICE_COOKIE_MAX_AGE = 365 * 24 * 3600
+
+
+def get_device_id():
+    """This browser's history id, from its cookie or newly issued (and stored in one)"""
+    if 'device_id' not in st.session_state:
+        device = st.context.cookies.get(DEVICE_COOKIE, "")
+        # Older links carried the id as ?device=; it is not trusted, only dropped from the URL
+        st.query_params.pop("device", None)
+        if len(device) != 32 or any(c not in "0123456789abcdef" for c in device):
+            device = uuid.uuid4().hex
+        st.session_state.device_id = device
+        if device != st.context.cookies.get(DEVICE_COOKIE):
+            st.html(
+                f"<script>document.cookie = '{DEVICE_COOKIE}={device}; path=/; "
+                f"max-age={DEVICE_COOKIE_MAX_AGE}; SameSite=Strict';</script>",
+                unsafe_allow_javascript=True
+            )
+    return st.session_state.device_id
 
-model, scaler, expected_columns = load_artifacts()
-expected_columns = list(expected_columns)
+if HISTORY_DB:
+    history = get_history_store(HISTORY_DB).for_user(get_device_id())
+else:
+    history = st.session_state.prediction_history
 
-# ------------------------ VALIDATION FUNCTIONS ------------------------ #
-def validate_inputs(age, bp, chol, hr):
-    """Validate user inputs and show warnings if needed"""
-    warnings = []
-    
-    if bp < 90 or bp > 180:
-        warnings.append("⚠️ Blood pressure seems unusual. Please verify your reading.")
-    
-    if chol > 300:
-        warnings.append("⚠️ Very high cholesterol detected. Please consult a doctor.")
-    
-    if hr < 50:
-        warnings.append("⚠️ Low heart rate detected. This may need medical attention.")
-    elif hr > 200:
-        warnings.append("⚠️ Extremely high heart rate. Please verify.")
-    
-    return warnings
 
 # ------------------------ HERO SECTION ------------------------ #
 hero_col1, hero_col2 = st.columns([1.7, 1.1])
@@ -407,11 +174,150 @@ with hero_col2:
 
 st.markdown("")
 
+# ------------------------ PARTIAL RERUNS ------------------------ #
+# Each panel below is an st.fragment, so a widget change reruns only the
+# panel it lives in. Runs are counted per session and timed into the
+# shared TimingStats (shown with ?debug=1).
+if 'rerun_counts' not in st.session_state:
+    st.session_state.rerun_counts = {}
+    st.session_state.last_timings = {}
+
+
+def record_run(scope, timer):
+    """Count a run of scope for this session and add its stage timings to the process-wide stats"""
+    counts = st.session_state.rerun_counts
+    counts[scope] = counts.get(scope, 0) + 1
+    st.session_state.last_timings[scope] = dict(timer.stages)
+    get_timing_stats().record(timer)
+
+
+def timed_fragment(name):
+    """st.fragment that counts and times its runs; the panel is called with a StageTimer"""
+    def decorate(panel):
+        @functools.wraps(panel)
+        def run():
+            timer = StageTimer()
+            try:
+                with timer.stage(f"fragment:{name}"):
+                    panel(timer)
+            finally:
+                record_run(name, timer)
+        return st.fragment(run, key=name)
+    return decorate
+
+
+# Rough size of a cached result without its rendered reports (scores, health levels, drivers, fields)
+RESULT_ENTRY_BYTES = 2048
+
+
+def score_cached(scoring_model, raw_input, timer):
+    """Prediction, category, health levels, drivers and report for the inputs, shared by all sessions
+
+    The report's bytes are rendered on the first download for these
+    inputs and then served from the cache to every later session.
+    """
+    cache = get_result_cache()
+    key = input_key(raw_input, scoring_model.version)
+    result = cache.get(key)
+    if result is not None:
+        return result
+
+    prediction, risk_score = scoring_model.score(raw_input, timer=timer)
+    risk_label, _, _ = get_risk_category(risk_score, prediction)
+    health = get_health_levels(
+        raw_input['RestingBP'], raw_input['Cholesterol'], raw_input['MaxHR'], raw_input['FastingBS']
+    )
+    # Reports are rendered only when a download is clicked, then kept with the result;
+    # each session stamps its own generated time into the shared bytes
+    report = PredictionReport(
+        build_report_fields(raw_input, risk_label, risk_score, health, scoring_model.version),
+        on_render=lambda: cache.resize(key, RESULT_ENTRY_BYTES + report.nbytes)
+    )
+    result = {
+        'prediction': prediction,
+        'risk_score': risk_score,
+        'risk_label': risk_label,
+        'health': health,
+        'contributions': scoring_model.contributions.explain(raw_input),
+        'report': report,
+    }
+    cache.put(key, result, RESULT_ENTRY_BYTES)
+    return result
+
+
+def analyze():
+    """ANALYZE callback: score the keyed inputs, then rerun only the panels that show the result"""
+    start = time.perf_counter()
+    timer = StageTimer()
+    raw_input = {feature: st.session_state[feature] for feature in INPUT_FEATURES}
+    scoring_model = model_registry.current
+    with st.spinner("🔄 Running AI model on your inputs..."):
+        result = score_cached(scoring_model, raw_input, timer)
+    prediction, risk_score = result['prediction'], result['risk_score']
+
+    generated = datetime.now()
+    history.append(
+        timestamp=generated,
+        risk_score=risk_score,
+        prediction=prediction,
+        model_version=scoring_model.version,
+        age=raw_input['Age'],
+        bp=raw_input['RestingBP'],
+        cholesterol=raw_input['Cholesterol']
+    )
+
+    st.session_state.last_result = {
+        'record': raw_input,
+        'prediction': prediction,
+        'risk_score': risk_score,
+        'health': result['health'],
+        'contributions': result['contributions'],
+        'percentile': get_reference_population().percentile(scoring_model, risk_score),
+        'model_version': scoring_model.version,
+        'report': result['report'],
+        'generated': generated,
+        'celebrate': True,
+    }
+    timer.add('analyze', time.perf_counter() - start)
+    record_run('analyze', timer)
+    st.rerun(scope=['result', 'downloads', 'trend'])
+
+
+def on_input_change():
+    """An input change also reruns the open panels that follow the inputs (live estimate, what-if)"""
+    followers = [
+        name for name, state_key in (('live', 'live_mode'), ('whatif', 'whatif_open'))
+        if st.session_state.get(state_key)
+    ]
+    if followers:
+        st.rerun(scope=['inputs', *followers])
+
+
+def show_risk_badge(risk_score, prediction):
+    risk_label, risk_class, risk_emoji = get_risk_category(risk_score, prediction)
+    st.markdown(f"""
+    <div style="margin-top:0.5rem; margin-bottom:0.8rem;">
+        <span class="risk-badge {risk_class}">
+            <span>{risk_emoji}</span>
+            <span>{risk_label}</span>
+        </span>
+    </div>
+    """, unsafe_allow_html=True)
+
+
+def show_gauge(risk_score, prediction):
+    from charts import gauge_figure
+
+    gauge_value = risk_score if risk_score is not None else (80 if prediction == 1 else 10)
+    st.plotly_chart(gauge_figure(gauge_value), use_container_width=True)
+
+
 # ------------------------ MAIN LAYOUT ------------------------ #
 left_col, right_col = st.columns([1.5, 1])
 
 # -------- LEFT: INPUTS -------- #
-with left_col:
+@timed_fragment('inputs')
+def input_panel(timer):
     st.markdown(
         """
         <div class="section-header">
@@ -428,34 +334,46 @@ with left_col:
         age = st.slider(
             "Age", 
             AGE_MIN, AGE_MAX, AGE_DEFAULT,
-            help="Your current age in years"
+            help="Your current age in years",
+            key="Age",
+            on_change=on_input_change
         )
         sex = st.selectbox(
             "Sex", 
-            ["M", "F"],
-            help="Biological sex assigned at birth"
+            CATEGORY_LEVELS['Sex'],
+            help="Biological sex assigned at birth",
+            key="Sex",
+            on_change=on_input_change
         )
         max_hr = st.slider(
             "Max Heart Rate", 
             HR_MIN, HR_MAX, HR_DEFAULT,
-            help="Maximum heart rate achieved during exercise (bpm)"
+            help="Maximum heart rate achieved during exercise (bpm)",
+            key="MaxHR",
+            on_change=on_input_change
         )
     with c2:
         resting_bp = st.number_input(
             "Resting Blood Pressure (mm Hg)", 
             BP_MIN, BP_MAX, BP_DEFAULT,
-            help="Normal: 90-120 | Elevated: 120-129 | High: ≥130"
+            help="Normal: 90-120 | Elevated: 120-129 | High: ≥130",
+            key="RestingBP",
+            on_change=on_input_change
         )
         cholesterol = st.number_input(
             "Cholesterol (mg/dL)", 
             CHOL_MIN, CHOL_MAX, CHOL_DEFAULT,
-            help="Normal: <200 | Borderline: 200-239 | High: ≥240"
+            help="Normal: <200 | Borderline: 200-239 | High: ≥240",
+            key="Cholesterol",
+            on_change=on_input_change
         )
         fasting_bs = st.selectbox(
             "Fasting Blood Sugar > 120 mg/dL", 
             [0, 1],
             format_func=lambda x: "No" if x == 0 else "Yes",
-            help="Whether your fasting blood sugar is above 120 mg/dL"
+            help="Whether your fasting blood sugar is above 120 mg/dL",
+            key="FastingBS",
+            on_change=on_input_change
         )
 
     st.markdown(
@@ -473,31 +391,41 @@ with left_col:
     with c3:
         chest_pain = st.selectbox(
             "Chest Pain Type", 
-            ["ATA", "NAP", "TA", "ASY"],
-            help="ATA: Atypical Angina | NAP: Non-Anginal Pain | TA: Typical Angina | ASY: Asymptomatic"
+            CATEGORY_LEVELS['ChestPainType'],
+            help="ATA: Atypical Angina | NAP: Non-Anginal Pain | TA: Typical Angina | ASY: Asymptomatic",
+            key="ChestPainType",
+            on_change=on_input_change
         )
         resting_ecg = st.selectbox(
             "Resting ECG", 
-            ["Normal", "ST", "LVH"],
-            help="Normal | ST: ST-T wave abnormality | LVH: Left ventricular hypertrophy"
+            CATEGORY_LEVELS['RestingECG'],
+            help="Normal | ST: ST-T wave abnormality | LVH: Left ventricular hypertrophy",
+            key="RestingECG",
+            on_change=on_input_change
         )
     with c4:
         exercise_angina = st.selectbox(
             "Exercise-Induced Angina", 
-            ["Y", "N"],
+            CATEGORY_LEVELS['ExerciseAngina'],
             format_func=lambda x: "Yes" if x == "Y" else "No",
-            help="Chest pain triggered by physical activity"
+            help="Chest pain triggered by physical activity",
+            key="ExerciseAngina",
+            on_change=on_input_change
         )
         st_slope = st.selectbox(
             "ST Slope", 
-            ["Up", "Flat", "Down"],
-            help="Slope of peak exercise ST segment"
+            CATEGORY_LEVELS['ST_Slope'],
+            help="Slope of peak exercise ST segment",
+            key="ST_Slope",
+            on_change=on_input_change
         )
 
     oldpeak = st.slider(
         "Oldpeak (ST Depression)", 
-        0.0, 6.0, 1.0, step=0.1,
-        help="ST depression induced by exercise relative to rest"
+        OLDPEAK_MIN, OLDPEAK_MAX, OLDPEAK_DEFAULT, step=0.1,
+        help="ST depression induced by exercise relative to rest",
+        key="Oldpeak",
+        on_change=on_input_change
     )
 
     st.markdown("")
@@ -506,8 +434,147 @@ with left_col:
     if warnings:
         for warning in warnings:
             st.warning(warning)
-    
-    predict_btn = st.button("🔍 ANALYZE HEART STROKE RISK")
+
+    st.button("🔍 ANALYZE HEART STROKE RISK", on_click=analyze)
+
+
+with left_col:
+    input_panel()
+
+# -------- RIGHT: RESULT -------- #
+@timed_fragment('result')
+def result_panel(timer):
+    result = st.session_state.get('last_result')
+    if result is None:
+        return
+    record = result['record']
+    prediction, risk_score = result['prediction'], result['risk_score']
+    # Animations play once, on the run right after the prediction
+    celebrate, result['celebrate'] = result['celebrate'], False
+
+    # In live mode the live panel above shows the badge and gauge for the current inputs
+    live_mode = st.session_state.get('live_mode', False)
+    if live_mode:
+        st.caption("Last analysis")
+    else:
+        show_risk_badge(risk_score, prediction)
+    if prediction == 1:
+        st.error("⚠️ **High Risk of Heart Disease Detected**")
+        st.write(
+            "Your inputs suggest a **higher likelihood of heart disease**. "
+            "Please consult a **cardiologist or healthcare professional** for a detailed evaluation."
+        )
+        if celebrate:
+            st.snow()
+    else:
+        st.success("✅ **Low Estimated Risk of Heart Disease**")
+        st.write(
+            "Based on the information provided, your **estimated risk appears low**. "
+            "Still, regular check-ups and a heart-healthy lifestyle are very important."
+        )
+        if celebrate:
+            st.balloons()
+
+    m1, m2, m3 = st.columns(3)
+    if risk_score is not None:
+        m1.metric("Estimated Risk", f"{risk_score}%")
+    else:
+        m1.metric("Estimated Risk", "N/A")
+    m2.metric("Age", f"{record['Age']} yrs")
+    m3.metric("Resting BP", f"{record['RestingBP']} mm Hg")
+    population_caption(result['percentile'])
+    st.caption(f"Model version: {result['model_version']}")
+
+    with timer.stage('chart'):
+        if live_mode:
+            drivers_col = st.container()
+        else:
+            gauge_col, drivers_col = st.columns([1.4, 1])
+            with gauge_col:
+                show_gauge(risk_score, prediction)
+
+        with drivers_col:
+            st.markdown("**What drove this risk**")
+            top_drivers = sorted(result['contributions'].items(), key=lambda kv: abs(kv[1]), reverse=True)[:5]
+            st.markdown("\n".join(
+                f"- {'🔺' if value > 0 else '🔻'} {FEATURE_LABELS[feature]} `{value:+.2f}`"
+                for feature, value in top_drivers
+            ))
+            st.caption("Log-odds vs. the average training patient. 🔺 raises risk, 🔻 lowers it.")
+
+    st.markdown("#### 🏥 Health Score Card")
+
+    bp_level, bp_emoji = result['health']['bp']
+    chol_level, chol_emoji = result['health']['chol']
+    hr_level, hr_emoji = result['health']['hr']
+    sugar_level, sugar_emoji = result['health']['sugar']
+
+    c1, c2, c3, c4 = st.columns(4)
+    with c1:
+        st.markdown(f"**Blood Pressure**\n\n{bp_emoji} {bp_level}\n\n`{record['RestingBP']} mm Hg`")
+    with c2:
+        st.markdown(f"**Cholesterol**\n\n{chol_emoji} {chol_level}\n\n`{record['Cholesterol']} mg/dL`")
+    with c3:
+        st.markdown(f"**Max Heart Rate**\n\n{hr_emoji} {hr_level}\n\n`{record['MaxHR']} bpm`")
+    with c4:
+        st.markdown(f"**Blood Sugar**\n\n{sugar_emoji} {sugar_level}\n\n`FastingBS = {record['FastingBS']}`")
+
+
+# -------- RIGHT: LIVE ESTIMATE -------- #
+@timed_fragment('live')
+def live_panel(timer):
+    # A newer input change preempts this run while it waits, so a burst renders once
+    timer.add('live_debounce', st.session_state.live_debouncer.wait())
+    with timer.stage('live_score'):
+        record = {feature: st.session_state[feature] for feature in INPUT_FEATURES}
+        scoring_model = model_registry.current
+        prediction, risk_score, _ = score_live(scoring_model, record)
+        percentile = get_reference_population().percentile(scoring_model, risk_score)
+    show_risk_badge(risk_score, prediction)
+    show_gauge(risk_score, prediction)
+    population_caption(percentile)
+    st.caption("Live estimate for the inputs on the left. Click **ANALYZE** to save it and get your report.")
+
+
+# -------- RIGHT: DOWNLOADS -------- #
+@timed_fragment('downloads')
+def download_panel(timer):
+    result = st.session_state.get('last_result')
+    if result is None:
+        return
+    report, generated = result['report'], result['generated']
+
+    with timer.stage('report'):
+        pdf_ready = False
+        if PDF_AVAILABLE:
+            try:
+                get_pdf_template()
+                pdf_ready = True
+            except Exception as e:
+                st.warning(f"PDF generation failed: {str(e)}. Offering text format only.")
+
+        if pdf_ready:
+            col1, col2 = st.columns(2)
+            with col1:
+                st.download_button(
+                    "📄 Download Report (PDF)",
+                    data=lambda: report.pdf_bytes(generated),
+                    file_name=report.pdf_name(generated),
+                    mime="application/pdf",
+                    on_click="ignore"
+                )
+            txt_col = col2
+        else:
+            txt_col = st.container()
+        with txt_col:
+            st.download_button(
+                "📝 Download Report (TXT)",
+                data=lambda: report.txt_bytes(generated),
+                file_name=report.txt_name(generated),
+                mime="text/plain",
+                on_click="ignore"
+            )
+
 
 # -------- RIGHT: SUMMARY & TIPS -------- #
 with right_col:
@@ -527,11 +594,13 @@ with right_col:
         "trained machine learning model, and an estimated risk level will appear below."
     )
 
-    placeholder_result = st.empty()
-    placeholder_metrics = st.empty()
-    placeholder_gauge = st.empty()
-    placeholder_health = st.empty()
-    placeholder_download = st.empty()
+    if st.toggle(
+        "⚡ Live scoring", key='live_mode',
+        help="Update the risk estimate as you change inputs. History and reports still wait for ANALYZE."
+    ):
+        live_panel()
+    result_panel()
+    download_panel()
 
     st.markdown("---")
 
@@ -558,351 +627,77 @@ with right_col:
         """
     )
 
-# ------------------------ HELPER: RISK CATEGORY ------------------------ #
-def get_risk_category(risk_score, prediction):
-    """Returns (label, class_name, emoji)"""
-    if risk_score is not None:
-        if risk_score < 20:
-            return "Low Risk", "low", "🟢"
-        elif risk_score < 50:
-            return "Moderate Risk", "moderate", "🟡"
-        else:
-            return "High Risk", "high", "🔴"
-    else:
-        if prediction == 1:
-            return "High Risk", "high", "🔴"
-        else:
-            return "Low Risk", "low", "🟢"
-
-# ------------------------ PREDICTION LOGIC ------------------------ #
-if predict_btn:
-    raw_input = {
-        'Age': age,
-        'RestingBP': resting_bp,
-        'Cholesterol': cholesterol,
-        'FastingBS': fasting_bs,
-        'MaxHR': max_hr,
-        'Oldpeak': oldpeak,
-        'Sex_' + sex: 1,
-        'ChestPainType_' + chest_pain: 1,
-        'RestingECG_' + resting_ecg: 1,
-        'ExerciseAngina_' + exercise_angina: 1,
-        'ST_Slope_' + st_slope: 1
-    }
-
-    input_df = pd.DataFrame([raw_input])
+# ------------------------ WHAT-IF EXPLORER ------------------------ #
+WHATIF_CURVE_POINTS = 200
+# Per axis of a two-feature heatmap, so up to 3,600 cells
+WHATIF_GRID_POINTS = 60
 
-    for col in expected_columns:
-        if col not in input_df.columns:
-            input_df[col] = 0
 
-    input_df = input_df[expected_columns]
-
-    with st.spinner("🔄 Running AI model on your inputs..."):
-        progress = st.progress(0)
-        status_text = st.empty()
-        
-        status_text.text("Preprocessing data...")
-        progress.progress(25)
-        time.sleep(0.3)
-        
-        status_text.text("Scaling features...")
-        progress.progress(50)
-        time.sleep(0.3)
-        
-        status_text.text("Running prediction model...")
-        progress.progress(75)
-        time.sleep(0.3)
-        
-        scaled_input = scaler.transform(input_df)
-        prediction = model.predict(scaled_input)[0]
-
-        risk_score = None
-        try:
-            proba = model.predict_proba(scaled_input)[0][1]
-            risk_score = round(float(proba) * 100, 1)
-        except Exception:
-            risk_score = None
-
-        status_text.text("Calculating risk score...")
-        progress.progress(100)
-        time.sleep(0.2)
-        
-        status_text.empty()
-        progress.empty()
-
-    st.session_state.prediction_history.append({
-        'timestamp': datetime.now(),
-        'risk_score': risk_score,
-        'prediction': prediction,
-        'age': age,
-        'bp': resting_bp,
-        'cholesterol': cholesterol
-    })
-
-    risk_label, risk_class, risk_emoji = get_risk_category(risk_score, prediction)
-    badge_html = f"""
-    <div style="margin-top:0.5rem; margin-bottom:0.8rem;">
-        <span class="risk-badge {risk_class}">
-            <span>{risk_emoji}</span>
-            <span>{risk_label}</span>
-        </span>
-    </div>
-    """
+@timed_fragment('whatif')
+def whatif_panel(timer):
+    st.markdown("---")
+    st.markdown(
+        """
+        <div class="section-header" style="margin-top:1.5rem;">
+            <span class="icon">🔬</span>
+            <span class="text-gradient-green-orange">What-If Explorer</span>
+        </div>
+        """,
+        unsafe_allow_html=True,
+    )
+    st.markdown('<hr class="gradient-line-pink-green">', unsafe_allow_html=True)
 
-    with placeholder_result.container():
-        st.markdown(badge_html, unsafe_allow_html=True)
-        if prediction == 1:
-            st.error("⚠️ **High Risk of Heart Disease Detected**")
-            st.write(
-                "Your inputs suggest a **higher likelihood of heart disease**. "
-                "Please consult a **cardiologist or healthcare professional** for a detailed evaluation."
-            )
-            st.snow()
-        else:
-            st.success("✅ **Low Estimated Risk of Heart Disease**")
-            st.write(
-                "Based on the information provided, your **estimated risk appears low**. "
-                "Still, regular check-ups and a heart-healthy lifestyle are very important."
-            )
-            st.balloons()
+    if not st.toggle(
+        "Show how your risk changes with one or two of your vitals", key='whatif_open',
+        help="Scores every value in the range at once. Nothing is saved to your history."
+    ):
+        return
 
-    with placeholder_gauge.container():
-        gauge_value = risk_score if risk_score is not None else (80 if prediction == 1 else 10)
-        fig = go.Figure(go.Indicator(
-            mode="gauge+number",
-            value=gauge_value,
-            title={'text': "Estimated Risk (%)", 'font': {'size': 18, 'color': '#f1f5f9'}},
-            number={'font': {'size': 36, 'color': '#f1f5f9'}},
-            gauge={
-                'axis': {'range': [0, 100], 'tickcolor': '#94a3b8'},
-                'bar': {'thickness': 0.35, 'color': '#ec4899'},
-                'bgcolor': 'rgba(15, 23, 42, 0.5)',
-                'steps': [
-                    {'range': [0, 20], 'color': "#065f46"},
-                    {'range': [20, 50], 'color': "#713f12"},
-                    {'range': [50, 100], 'color': "#7f1d1d"},
-                ],
-                'threshold': {
-                    'line': {'color': "#f1f5f9", 'width': 3},
-                    'thickness': 0.75,
-                    'value': gauge_value
-                }
-            }
-        ))
-        fig.update_layout(
-            paper_bgcolor='rgba(0,0,0,0)',
-            plot_bgcolor='rgba(0,0,0,0)',
-            font={'color': '#f1f5f9'},
-            margin=dict(l=20, r=20, t=50, b=20),
-            height=280,
-            autosize=True
+    col1, col2 = st.columns(2)
+    with col1:
+        sweep_x = st.selectbox("Vary", list(SWEEP_RANGES), format_func=FEATURE_LABELS.get, key='whatif_x')
+    with col2:
+        sweep_y = st.selectbox(
+            "Against (optional)", [None] + [feature for feature in SWEEP_RANGES if feature != sweep_x],
+            format_func=lambda feature: "—" if feature is None else FEATURE_LABELS[feature], key='whatif_y'
+        )
+    features = [sweep_x] if sweep_y is None else [sweep_x, sweep_y]
+    points = WHATIF_CURVE_POINTS if sweep_y is None else WHATIF_GRID_POINTS
+
+    record = {feature: st.session_state[feature] for feature in INPUT_FEATURES}
+    with timer.stage('sweep'):
+        scoring_model = model_registry.current
+        grid = {feature: sweep_values(feature, points) for feature in features}
+        risks = scoring_model.sweep(record, grid)
+        _, current_risk = scoring_model.score(record)
+
+    with timer.stage('chart'):
+        from charts import sweep_figure
+
+        fig = sweep_figure(
+            [FEATURE_LABELS[feature] for feature in features], list(grid.values()), risks,
+            [record[feature] for feature in features], current_risk
         )
         st.plotly_chart(fig, use_container_width=True)
+    st.caption(f"✖ marks your current inputs ({current_risk}%). Everything else is held at your values.")
 
-    with placeholder_metrics.container():
-        m1, m2, m3 = st.columns(3)
-        if risk_score is not None:
-            m1.metric("Estimated Risk", f"{risk_score}%")
-        else:
-            m1.metric("Estimated Risk", "N/A")
-        m2.metric("Age", f"{age} yrs")
-        m3.metric("Resting BP", f"{resting_bp} mm Hg")
-
-    with placeholder_health.container():
-        st.markdown("#### 🏥 Health Score Card")
-
-        def level_and_emoji(value, low_thr, high_thr):
-            if value < low_thr:
-                return "Good", "🟢"
-            elif value < high_thr:
-                return "Borderline", "🟡"
-            else:
-                return "High", "🔴"
-
-        bp_level, bp_emoji = level_and_emoji(resting_bp, 120, 140)
-        chol_level, chol_emoji = level_and_emoji(cholesterol, 200, 240)
-        
-        if max_hr >= 150:
-            hr_level, hr_emoji = "Good", "🟢"
-        elif max_hr >= 120:
-            hr_level, hr_emoji = "Average", "🟡"
-        else:
-            hr_level, hr_emoji = "Low Capacity", "🔴"
-
-        sugar_level = "Normal" if fasting_bs == 0 else "High"
-        sugar_emoji = "🟢" if fasting_bs == 0 else "🔴"
-
-        c1, c2, c3, c4 = st.columns(4)
-        with c1:
-            st.markdown(f"**Blood Pressure**\n\n{bp_emoji} {bp_level}\n\n`{resting_bp} mm Hg`")
-        with c2:
-            st.markdown(f"**Cholesterol**\n\n{chol_emoji} {chol_level}\n\n`{cholesterol} mg/dL`")
-        with c3:
-            st.markdown(f"**Max Heart Rate**\n\n{hr_emoji} {hr_level}\n\n`{max_hr} bpm`")
-        with c4:
-            st.markdown(f"**Blood Sugar**\n\n{sugar_emoji} {sugar_level}\n\n`FastingBS = {fasting_bs}`")
-
-    with placeholder_download.container():
-        report_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        lines = [
-            "=" * 50,
-            "HEART STROKE RISK REPORT",
-            "=" * 50,
-            f"Generated: {report_time}",
-            "",
-            f"Risk Category: {risk_label}",
-            f"Estimated Risk: {risk_score if risk_score is not None else 'N/A'}%",
-            "",
-            "INPUT DETAILS:",
-            "-" * 50,
-            f"Age: {age} years",
-            f"Sex: {sex}",
-            f"Resting Blood Pressure: {resting_bp} mm Hg",
-            f"Cholesterol: {cholesterol} mg/dL",
-            f"Fasting Blood Sugar: {'Yes (>120)' if fasting_bs == 1 else 'No (<120)'}",
-            f"Max Heart Rate: {max_hr} bpm",
-            f"Oldpeak: {oldpeak}",
-            f"Chest Pain Type: {chest_pain}",
-            f"Resting ECG: {resting_ecg}",
-            f"Exercise-Induced Angina: {exercise_angina}",
-            f"ST Slope: {st_slope}",
-            "",
-            "HEALTH INDICATORS:",
-            "-" * 50,
-            f"Blood Pressure: {bp_level} ({resting_bp} mm Hg)",
-            f"Cholesterol: {chol_level} ({cholesterol} mg/dL)",
-            f"Max Heart Rate: {hr_level} ({max_hr} bpm)",
-            f"Blood Sugar: {sugar_level}",
-            "",
-            "DISCLAIMER:",
-            "-" * 50,
-            "This report is for educational purposes only and is NOT a",
-            "medical diagnosis. Please consult with a qualified healthcare",
-            "professional for proper medical advice and treatment.",
-            "",
-            "If you experience chest pain, shortness of breath, or other",
-            "concerning symptoms, seek emergency medical care immediately.",
-            "=" * 50
-        ]
-        report_text = "\n".join(lines)
-
-        if PDF_AVAILABLE:
-            try:
-                pdf = FPDF()
-                pdf.set_auto_page_break(auto=True, margin=15)
-                pdf.set_left_margin(10)
-                pdf.set_right_margin(10)
-                pdf.add_page()
-                
-                epw = pdf.w - pdf.l_margin - pdf.r_margin
-                
-                pdf.set_font("Arial", "B", 18)
-                pdf.cell(0, 12, "Heart Stroke Risk Report", ln=True, align='C')
-                pdf.ln(6)
-                
-                pdf.set_font("Arial", "", 10)
-                pdf.set_text_color(80, 80, 80)
-                pdf.multi_cell(epw, 5, f"Generated: {report_time}", align='C')
-                pdf.ln(4)
-                
-                pdf.set_text_color(0, 0, 0)
-                pdf.set_font("Arial", "B", 14)
-                pdf.cell(0, 8, "Risk Assessment", ln=True)
-                pdf.set_font("Arial", "", 11)
-                
-                pdf.multi_cell(epw, 6, f"Risk Category: {risk_label}")
-                pdf.multi_cell(epw, 6, f"Estimated Risk Score: {risk_score if risk_score is not None else 'N/A'}%")
-                pdf.ln(4)
-                
-                pdf.set_font("Arial", "B", 14)
-                pdf.cell(0, 8, "Input Details", ln=True)
-                pdf.set_font("Arial", "", 10)
-                
-                input_details = [
-                    f"Age: {age} years",
-                    f"Sex: {sex}",
-                    f"Resting Blood Pressure: {resting_bp} mm Hg",
-                    f"Cholesterol: {cholesterol} mg/dL",
-                    f"Fasting Blood Sugar: {'Yes (>120)' if fasting_bs == 1 else 'No (<120)'}",
-                    f"Max Heart Rate: {max_hr} bpm",
-                    f"Oldpeak: {oldpeak}",
-                    f"Chest Pain Type: {chest_pain}",
-                    f"Resting ECG: {resting_ecg}",
-                    f"Exercise-Induced Angina: {exercise_angina}",
-                    f"ST Slope: {st_slope}",
-                ]
-                
-                for detail in input_details:
-                    pdf.multi_cell(epw, 5, detail)
-                pdf.ln(4)
-                
-                pdf.set_font("Arial", "B", 14)
-                pdf.cell(0, 8, "Health Indicators", ln=True)
-                pdf.set_font("Arial", "", 10)
-                
-                health_indicators = [
-                    f"Blood Pressure: {bp_level} ({resting_bp} mm Hg)",
-                    f"Cholesterol: {chol_level} ({cholesterol} mg/dL)",
-                    f"Max Heart Rate: {hr_level} ({max_hr} bpm)",
-                    f"Blood Sugar: {sugar_level}",
-                ]
-                
-                for indicator in health_indicators:
-                    pdf.multi_cell(epw, 5, indicator)
-                pdf.ln(6)
-                
-                pdf.set_font("Arial", "B", 12)
-                pdf.set_text_color(200, 0, 0)
-                pdf.cell(0, 8, "IMPORTANT DISCLAIMER", ln=True)
-                pdf.set_font("Arial", "", 9)
-                pdf.set_text_color(80, 80, 80)
-                
-                disclaimer_text = (
-                    "This report is for educational purposes only and is NOT a medical diagnosis. "
-                    "Please consult with a qualified healthcare professional for proper medical "
-                    "advice and treatment. If you experience chest pain, shortness of breath, or "
-                    "other concerning symptoms, seek emergency medical care immediately."
-                )
-                pdf.multi_cell(epw, 5, disclaimer_text)
-                
-                pdf_bytes = pdf.output(dest="S").encode("latin-1")
-                
-                col1, col2 = st.columns(2)
-                with col1:
-                    st.download_button(
-                        "📄 Download Report (PDF)",
-                        data=pdf_bytes,
-                        file_name=f"heart_risk_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf",
-                        mime="application/pdf"
-                    )
-                with col2:
-                    st.download_button(
-                        "📝 Download Report (TXT)",
-                        data=report_text.encode("utf-8"),
-                        file_name=f"heart_risk_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt",
-                        mime="text/plain"
-                    )
-            
-            except Exception as e:
-                st.warning(f"PDF generation failed: {str(e)}. Offering text format only.")
-                st.download_button(
-                    "📝 Download Report (TXT)",
-                    data=report_text.encode("utf-8"),
-                    file_name=f"heart_risk_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt",
-                    mime="text/plain"
-                )
-        else:
-            st.download_button(
-                "📝 Download Report (TXT)",
-                data=report_text.encode("utf-8"),
-                file_name=f"heart_risk_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt",
-                mime="text/plain"
-            )
 
+whatif_panel()
 
 # ------------------------ PREDICTION HISTORY ------------------------ #
-if len(st.session_state.prediction_history) > 1:
+TREND_WINDOWS = {
+    "Last hour": timedelta(hours=1),
+    "Last 24 hours": timedelta(days=1),
+    "Last 7 days": timedelta(days=7),
+    "All time": None,
+}
+
+
+@timed_fragment('trend')
+def trend_panel(timer):
+    history_summary = history.summary()
+    if history_summary['total'] <= 1:
+        return
     st.markdown("---")
     st.markdown(
         """
@@ -914,47 +709,242 @@ if len(st.session_state.prediction_history) > 1:
         unsafe_allow_html=True,
     )
     st.markdown('<hr class="gradient-line-pink-blue">', unsafe_allow_html=True)
-    
-    history_df = pd.DataFrame(st.session_state.prediction_history)
-    history_df['timestamp'] = pd.to_datetime(history_df['timestamp'])
-    history_df['time_label'] = history_df['timestamp'].dt.strftime('%H:%M:%S')
-    
-    fig_trend = go.Figure()
-    fig_trend.add_trace(go.Scatter(
-        x=history_df['time_label'],
-        y=history_df['risk_score'],
-        mode='lines+markers',
-        name='Risk Score',
-        line=dict(color='#ec4899', width=3),
-        marker=dict(size=10, color='#ec4899', line=dict(color='#fff', width=2))
-    ))
-    
-    fig_trend.update_layout(
-        title='Risk Score Over Time',
-        xaxis_title='Time',
-        yaxis_title='Risk Score (%)',
-        paper_bgcolor='rgba(0,0,0,0)',
-        plot_bgcolor='rgba(15, 23, 42, 0.5)',
-        font={'color': '#f1f5f9'},
-        height=300,
-        margin=dict(l=20, r=20, t=40, b=20),
-        yaxis=dict(range=[0, 100]),
-        autosize=True
+
+    trend_window = st.radio(
+        "Window", list(TREND_WINDOWS), index=len(TREND_WINDOWS) - 1, horizontal=True,
+        label_visibility="collapsed"
     )
-    
-    st.plotly_chart(fig_trend, use_container_width=True)
-    
+
+    with timer.stage('trend_chart'):
+        from charts import trend_figure
+
+        window = TREND_WINDOWS[trend_window]
+        # Downsampled to TREND_MAX_POINTS, so the payload stays flat however long the history gets
+        trend_times, trend_scores = history.trend(since=datetime.now() - window if window else None)
+
+        if len(trend_times):
+            st.plotly_chart(trend_figure(trend_times, trend_scores), use_container_width=True)
+        else:
+            st.info(f"No checks in the {trend_window.lower()}.")
+
     col1, col2, col3 = st.columns(3)
     with col1:
-        st.metric("Total Checks", len(st.session_state.prediction_history))
+        st.metric("Total Checks", history_summary['total'])
     with col2:
-        avg_risk = history_df['risk_score'].mean()
-        st.metric("Average Risk", f"{avg_risk:.1f}%" if pd.notna(avg_risk) else "N/A")
+        avg_risk = history_summary['mean_risk']
+        st.metric("Average Risk", f"{avg_risk:.1f}%" if avg_risk is not None else "N/A")
     with col3:
-        latest_risk = history_df['risk_score'].iloc[-1]
-        previous_risk = history_df['risk_score'].iloc[-2] if len(history_df) > 1 else latest_risk
-        delta = latest_risk - previous_risk if pd.notna(latest_risk) and pd.notna(previous_risk) else 0
-        st.metric("Latest vs Previous", f"{latest_risk:.1f}%" if pd.notna(latest_risk) else "N/A", f"{delta:+.1f}%")
+        latest_risk, previous_risk = history_summary['latest_risk'], history_summary['previous_risk']
+        delta = latest_risk - previous_risk if latest_risk is not None and previous_risk is not None else 0
+        st.metric("Latest vs Previous", f"{latest_risk:.1f}%" if latest_risk is not None else "N/A", f"{delta:+.1f}%")
+
+
+
+trend_panel()
+
+# ------------------------ BATCH CSV SCORING ------------------------ #
+st.markdown("---")
+st.markdown(
+    """
+    <div class="section-header" style="margin-top:1.5rem;">
+        <span class="icon">📂</span>
+        <span class="text-gradient-blue-pink">Batch CSV Scoring</span>
+    </div>
+    """,
+    unsafe_allow_html=True,
+)
+st.markdown('<hr class="gradient-line-blue-pink">', unsafe_allow_html=True)
+
+st.markdown(
+    "Upload a screening list with the columns "
+    f"`{', '.join(INPUT_FEATURES)}` "
+    "to score every patient at once."
+)
+
+REPORT_EXPORT_OPTIONS = {
+    "None": (),
+    "PDF": ('pdf',),
+    "TXT": ('txt',),
+    "PDF + TXT": ('pdf', 'txt'),
+}
+
+# Cohort dashboard aggregates per (uploaded file, model version), shared by all sessions
+COHORT_CACHE_BYTES = 16 * 2**20
+
+@st.cache_resource
+def get_cohort_cache():
+    return heart_core.ResultCache(COHORT_CACHE_BYTES)
+
+
+def dataset_key(uploaded_file, model_version):
+    digest = hashlib.blake2b(uploaded_file.getvalue(), digest_size=16)
+    digest.update(model_version.encode())
+    return digest.hexdigest()
+
+
+def cohort_dashboard(timer):
+    """Risk histogram, risk by chest pain type and ST slope, and age vs risk for the last scored upload"""
+    key = st.session_state.get('cohort_key')
+    summary = get_cohort_cache().get(key) if key else None
+    if summary is None:
+        return
+    from charts import cohort_figures
+
+    with timer.stage('cohort'):
+        figures = cohort_figures(key, summary, FEATURE_LABELS)
+        scored = summary['rows'] - summary['invalid']
+        high_risk = summary['risk_counts'][summary['risk_bins'][:-1] >= HIGH_RISK_THRESHOLD].sum()
+        st.markdown("**Cohort overview**")
+        st.caption(
+            f"{scored:,} patients scored • {high_risk / max(scored, 1):.0%} high risk"
+            + (f" • {summary['invalid']:,} invalid rows left out" if summary['invalid'] else "")
+        )
+        col1, col2 = st.columns(2)
+        with col1:
+            st.plotly_chart(figures['histogram'], use_container_width=True)
+        with col2:
+            st.plotly_chart(figures['scatter'], use_container_width=True)
+        for col, feature in zip(st.columns(len(COHORT_GROUP_FEATURES)), COHORT_GROUP_FEATURES):
+            with col:
+                st.plotly_chart(figures[feature], use_container_width=True)
+
+
+@timed_fragment('batch')
+def batch_panel(timer):
+    uploaded_file = st.file_uploader(
+        "Patient CSV" + (" or Parquet" if PARQUET_AVAILABLE else ""),
+        type=["csv", "parquet"] if PARQUET_AVAILABLE else ["csv"]
+    )
+    report_export = st.selectbox(
+        "Per-patient reports (ZIP)",
+        [name for name in REPORT_EXPORT_OPTIONS if PDF_AVAILABLE or 'pdf' not in REPORT_EXPORT_OPTIONS[name]],
+        help="Render a report for every scored patient, in parallel across CPU cores. CSV uploads only."
+    )
+    if uploaded_file is not None and st.button("📂 SCORE UPLOADED FILE"):
+        # Parquet in, Parquet out; reports are rendered from the scored CSV only
+        is_parquet = uploaded_file.name.lower().endswith(".parquet")
+        if is_parquet:
+            scored_file = tempfile.TemporaryFile()
+        else:
+            scored_file = tempfile.TemporaryFile(mode="w+", encoding="utf-8", newline="")
+        reports_file = tempfile.TemporaryFile()
+        try:
+            scoring_model = model_registry.current
+            cohort_key = dataset_key(uploaded_file, scoring_model.version)
+            # Aggregated while scoring, unless this file was already summarized
+            aggregator = None if get_cohort_cache().get(cohort_key) is not None else CohortAggregator()
+            on_chunk = aggregator.add if aggregator is not None else None
+            with st.spinner("🔄 Scoring uploaded patients..."), timer.stage('batch_score'):
+                if is_parquet:
+                    n_rows = score_parquet(uploaded_file, scored_file, scoring_model, on_chunk=on_chunk)
+                else:
+                    n_rows = score_csv(uploaded_file, scored_file, scoring_model, on_chunk=on_chunk)
+            if aggregator is not None:
+                summary = aggregator.summary()
+                get_cohort_cache().put(cohort_key, summary, summary['nbytes'])
+            st.session_state.cohort_key = cohort_key
+            elapsed = timer.stages['batch_score']
+            scored_file.seek(0)
+            st.success(f"✅ Scored {n_rows:,} patients in {elapsed:.2f}s")
+
+            export_formats = None if is_parquet else REPORT_EXPORT_OPTIONS[report_export]
+            if export_formats:
+                progress_bar = st.progress(0.0, text="🔄 Rendering patient reports...")
+                with timer.stage('report_export'):
+                    export = export_reports(
+                        scored_file, reports_file, formats=export_formats,
+                        progress=lambda rows, _: progress_bar.progress(
+                            rows / n_rows, text=f"🔄 Rendered reports for {rows:,} / {n_rows:,} patients"
+                        )
+                    )
+                progress_bar.empty()
+                st.success(
+                    f"✅ {export['reports']:,} report files in {export['seconds']:.2f}s "
+                    f"({export['patients_per_sec']:,.0f} patients/sec)"
+                    + (f" • {export['skipped']:,} invalid rows skipped" if export['skipped'] else "")
+                )
+                scored_file.seek(0)
+                reports_file.seek(0)
+
+            file_type, extension = ("Parquet", "parquet") if is_parquet else ("CSV", "csv")
+            st.download_button(
+                f"📥 Download Scored {file_type}",
+                # Binary temp files are not accepted as data, text ones are
+                data=scored_file.read() if is_parquet else scored_file,
+                file_name=f"heart_risk_scored_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{extension}",
+                mime="application/vnd.apache.parquet" if is_parquet else "text/csv",
+                on_click="ignore"
+            )
+            if export_formats:
+                st.download_button(
+                    "🗂️ Download Patient Reports (ZIP)",
+                    data=reports_file.read(),
+                    file_name=f"heart_risk_reports_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip",
+                    mime="application/zip",
+                    on_click="ignore"
+                )
+        except ValueError as e:
+            st.error(f"❌ Could not score file: {str(e)}")
+        finally:
+            scored_file.close()
+            reports_file.close()
+
+    cohort_dashboard(timer)
+
+
+batch_panel()
+
+# ------------------------ DEBUG TIMINGS ------------------------ #
+# Full script runs only; fragment runs never reach this point
+run_timer.add('app_run', time.perf_counter() - script_start)
+record_run('app', run_timer)
+
+if DEBUG_TIMINGS:
+    with st.expander("⏱️ Performance Timings", expanded=True):
+        if run_timer.stages:
+            st.markdown("**This run**")
+            st.dataframe(
+                pd.DataFrame(
+                    [(name, seconds * 1000) for name, seconds in run_timer.stages.items()],
+                    columns=["stage", "ms"]
+                ),
+                hide_index=True
+            )
+        st.caption(
+            f"Model {heart_model.version} • reloads: {model_registry.reloads}"
+            + (f" • last reload error: {model_registry.last_error}" if model_registry.last_error else "")
+        )
+        reference = get_reference_population()
+        reference_index = reference.index_for(heart_model)
+        st.caption(
+            f"Reference cohort: {reference.path} • "
+            + (f"{len(reference_index):,} scores, {reference.builds} builds" if reference_index else "not loaded")
+            + (f" • error: {reference.last_error}" if reference.last_error else "")
+        )
+        cache_stats = get_result_cache().stats()
+        st.caption(
+            f"Result cache: {cache_stats['hits']:,} hits, {cache_stats['misses']:,} misses "
+            f"({cache_stats['hit_rate']:.0%} hit rate) • {cache_stats['entries']:,} entries, "
+            f"{cache_stats['bytes'] / 2**20:.1f} / {cache_stats['max_bytes'] / 2**20:.0f} MB • "
+            f"{cache_stats['evictions']:,} evictions"
+        )
+        st.markdown("**Runs this session** (refreshed on full runs)")
+        st.dataframe(
+            pd.DataFrame(
+                [
+                    (scope, runs, max(st.session_state.last_timings[scope].values(), default=0.0) * 1000)
+                    for scope, runs in st.session_state.rerun_counts.items()
+                ],
+                columns=["scope", "runs", "last ms"]
+            ),
+            hide_index=True
+        )
+        st.markdown("**All sessions (this process)**")
+        summary = get_timing_stats().summary()
+        if summary:
+            st.dataframe(pd.DataFrame(summary), hide_index=True)
+        else:
+            st.caption("No timed runs yet.")
 
 # ------------------------ FOOTER ------------------------ #
 st.markdown("---")
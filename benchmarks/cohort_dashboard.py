@@ -0,0 +1,97 @@
+"""Cohort dashboard cost by batch size: aggregation time and plotted payload.
+
+Random patients are scored in BATCH_CHUNK_ROWS chunks as score_csv does,
+and each scored chunk is fed to heart_core.CohortAggregator. For every
+size this prints the aggregation time (on top of scoring), the time to
+build the charts.py figures, and the JSON the dashboard sends
+(plotly.io.to_json of all four figures) next to what an age-vs-risk
+scatter of every raw row would send. Before timing, it checks that
+category values padded with spaces aggregate like clean ones.
+
+    python benchmarks/cohort_dashboard.py --rows 10000 100000 1000000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import plotly.io as pio
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import charts  # noqa: E402
+import heart_core  # noqa: E402
+from heart_core import BATCH_CHUNK_ROWS, FEATURE_LABELS, INPUT_FEATURES, CohortAggregator  # noqa: E402
+from loadtest import random_record  # noqa: E402
+
+
+def scored_chunks(model, rows):
+    rng = random.Random(0)
+    chunk = pd.DataFrame([random_record(rng) for _ in range(BATCH_CHUNK_ROWS)], columns=INPUT_FEATURES)
+    scored = model.score_frame(chunk)
+    # Reuse one scored chunk; aggregation cost does not depend on the values
+    for start in range(0, rows, BATCH_CHUNK_ROWS):
+        yield scored.iloc[:min(BATCH_CHUNK_ROWS, rows - start)]
+
+
+def check_padded_levels(model):
+    """Exit if padding the grouped categories with spaces changes the summary"""
+    rng = random.Random(1)
+    chunk = pd.DataFrame([random_record(rng) for _ in range(1000)], columns=INPUT_FEATURES)
+    padded = chunk.copy()
+    for feature in heart_core.COHORT_GROUP_FEATURES:
+        padded[feature] = " " + padded[feature] + " "
+    summaries = []
+    for frame in (chunk, padded):
+        aggregator = CohortAggregator()
+        aggregator.add(model.score_frame(frame))
+        summaries.append(aggregator.summary())
+    for feature in heart_core.COHORT_GROUP_FEATURES:
+        clean, spaced = summaries[0]['groups'][feature], summaries[1]['groups'][feature]
+        if not (np.array_equal(clean['counts'], spaced['counts'])
+                and np.allclose(clean['mean_risk'], spaced['mean_risk'], equal_nan=True)):
+            raise SystemExit(f"Padded {feature} values aggregate differently from clean ones")
+
+
+def raw_scatter_bytes(chunks):
+    """JSON size of a Scattergl holding every scored row"""
+    df = pd.concat(chunks)
+    fig = go.Figure(go.Scattergl(x=df['Age'], y=df['risk_score'].round(1), mode='markers'))
+    return len(pio.to_json(fig, validate=False))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000, 1000000])
+    args = parser.parse_args()
+
+    model = heart_core.ModelRegistry(poll_interval=0).current
+    check_padded_levels(model)
+    print(f"{'rows':>10} {'aggregate':>11} {'figures':>9} {'payload':>10} {'raw scatter':>13}")
+    for rows in args.rows:
+        chunks = list(scored_chunks(model, rows))
+        aggregator = CohortAggregator()
+        start = time.perf_counter()
+        for chunk in chunks:
+            aggregator.add(chunk)
+        summary = aggregator.summary()
+        aggregate_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        figures = charts.cohort_figures(("bench", rows), summary, FEATURE_LABELS)
+        payload = sum(len(pio.to_json(figure, validate=False)) for figure in figures.values())
+        figures_ms = (time.perf_counter() - start) * 1000
+
+        print(
+            f"{rows:>10,} {aggregate_ms:>8.1f} ms {figures_ms:>6.1f} ms {payload / 1024:>7.1f} KB "
+            f"{raw_scatter_bytes(chunks) / 1024:>10.1f} KB"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Microbenchmark of per-rerun figure cost: rebuilt go.Figure vs charts.py templates.
+
+Each case times building the figure ("build") and then the total with
+the serialization st.plotly_chart does on it on every call, cache hit or
+not (return_figure_from_figure_or_data + plotly.io.to_json). The what-if
+cases also include scoring their grid with HeartModel.sweep.
+
+    python benchmarks/figures.py --repeat 500
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import plotly.io as pio
+import plotly.tools
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import charts  # noqa: E402
+import heart_core  # noqa: E402
+
+
+def st_serialize(figure):
+    """What st.plotly_chart does with a figure before sending it"""
+    figure = plotly.tools.return_figure_from_figure_or_data(figure, validate_figure=True)
+    return pio.to_json(figure, validate=False)
+
+
+def rebuilt_gauge(value):
+    fig = charts._build_gauge()
+    fig.update_traces(value=value, gauge_threshold_value=value)
+    return fig
+
+
+def rebuilt_trend(times, scores):
+    fig = charts._build_trend()
+    fig.update_traces(x=times, y=scores)
+    return fig
+
+
+def whatif(model, features, points, i):
+    # More distinct inputs than the figure cache holds, so every call builds a new figure
+    record = dict(heart_core.DEFAULT_RECORD, Age=heart_core.AGE_MIN + i % (heart_core.AGE_MAX - heart_core.AGE_MIN))
+    grid = {feature: heart_core.sweep_values(feature, points) for feature in features}
+    risks = model.sweep(record, grid)
+    current_risk = model.score(record)[1]
+    return charts.sweep_figure(features, list(grid.values()), risks, [record[f] for f in features], current_risk)
+
+
+def timed(fn, repeat):
+    fn()
+    start = time.perf_counter()
+    for i in range(repeat):
+        fn(i)
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def serialized(build):
+    return lambda i=0: st_serialize(build(i))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=300)
+    parser.add_argument("--points", type=int, default=300, help="trend points (the app's budget is 300)")
+    args = parser.parse_args()
+
+    times = (np.datetime64('2026-01-01T00:00') + np.arange(args.points) * np.timedelta64(1, 'm')).astype('datetime64[ns]')
+    scores = (np.random.default_rng(0).random(args.points) * 100).astype(np.float32)
+    model = heart_core.ModelRegistry(poll_interval=0).current
+
+    cases = [
+        ("gauge  rebuilt", lambda i=0: rebuilt_gauge(i % 100)),
+        ("gauge  template, new value", lambda i=0: charts._patch_gauge(i % 100)),
+        ("gauge  template, cached", lambda i=0: charts.gauge_figure(42.0)),
+        ("trend  rebuilt", lambda i=0: rebuilt_trend(times, scores)),
+        ("trend  template, new data", lambda i=0: charts._patch_trend(times, scores)),
+        ("trend  template, cached", lambda i=0: charts.trend_figure(times, scores)),
+        ("what-if curve, 200 points", lambda i=0: whatif(model, ['Cholesterol'], 200, i)),
+        ("what-if heatmap, 60x60", lambda i=0: whatif(model, ['Cholesterol', 'RestingBP'], 60, i)),
+    ]
+    print(f"{'case':<30}{'build ms':>10}{'+ serialize':>13}")
+    for name, build in cases:
+        print(f"{name:<30}{timed(build, args.repeat):>10.3f}{timed(serialized(build), args.repeat):>13.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Benchmark of the SQLite prediction history (history.HistoryStore).
+
+Fills a fresh database with --rows predictions spread over --users
+devices through the normal append() path, then times the queries the
+app runs on every rerun of the trend section.
+
+    python benchmarks/history_store.py --rows 1000000 --users 1000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from history import HistoryStore  # noqa: E402
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    ms = np.array(samples) * 1000
+    return f"p50 {np.percentile(ms, 50):7.2f} ms  p99 {np.percentile(ms, 99):7.2f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--db", help="database path (default: a temporary file)")
+    args = parser.parse_args()
+
+    tmpdir = None
+    if args.db is None:
+        tmpdir = tempfile.TemporaryDirectory()
+        args.db = os.path.join(tmpdir.name, "history.db")
+
+    rng = random.Random(0)
+    users = [f"device-{i:05d}" for i in range(args.users)]
+    start_time = datetime(2026, 1, 1)
+    store = HistoryStore(args.db)
+
+    append_samples = []
+    start = time.perf_counter()
+    for i in range(args.rows):
+        user = users[i % args.users]
+        ts = start_time + timedelta(seconds=30 * i)
+        t0 = time.perf_counter()
+        store.append(user, ts, round(rng.uniform(0, 100), 1), rng.randint(0, 1), "bench", 50, 130, 220)
+        append_samples.append(time.perf_counter() - t0)
+    queued = time.perf_counter() - start
+    store.flush()
+    elapsed = time.perf_counter() - start
+
+    append_us = np.array(append_samples) * 1e6
+    print(f"rows         {args.rows:,} over {args.users:,} users  ({os.path.getsize(args.db) / 2**20:,.1f} MiB)")
+    print(f"append       p50 {np.percentile(append_us, 50):.1f} us  p99 {np.percentile(append_us, 99):.1f} us "
+          f"(queued in {queued:.2f}s)")
+    print(f"committed    {args.rows / elapsed:,.0f} rows/s")
+
+    user = users[0]
+    last_week = start_time + timedelta(seconds=30 * args.rows) - timedelta(days=7)
+    print(f"summary      {timed(lambda: store.summary(user), args.repeat)}")
+    print(f"summary 7d   {timed(lambda: store.summary(user, since=last_week), args.repeat)}")
+    print(f"trend        {timed(lambda: store.trend(user), args.repeat)}")
+    print(f"trend 7d     {timed(lambda: store.trend(user, since=last_week), args.repeat)}")
+
+    store.close()
+    if tmpdir is not None:
+        tmpdir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Live scoring latency benchmark; exits non-zero when a budget is exceeded.
+
+The score_live budget and the debouncing are enforced by
+tests/test_live.py; this optional script also times the live panel in
+the running app, through page_weight.run_fragment.
+
+Measures the fast path on its own (heart_core.score_live on random
+records) and the live panel as it reruns in app6.py after an input
+change: the inputs and live fragments only, timed inside the script
+(fragment:live less the debounce wait, read from the session's
+last_timings). Changes are spaced by LIVE_DEBOUNCE_SECONDS so the
+debounce never waits; a burst of back-to-back changes checks that it does.
+
+    python benchmarks/live_budget.py
+    python benchmarks/live_budget.py --fast-budget-ms 0.5 --panel-budget-ms 20
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+import heart_core  # noqa: E402
+from heart_core import LIVE_DEBOUNCE_SECONDS, score_live  # noqa: E402
+from loadtest import random_record  # noqa: E402
+from page_weight import run_fragment  # noqa: E402
+
+
+def percentiles(samples_ms):
+    return np.percentile(samples_ms, 50), np.percentile(samples_ms, 95)
+
+
+def fast_path_ms(n):
+    model = heart_core.ModelRegistry(poll_interval=0).current
+    rng = random.Random(0)
+    records = [random_record(rng) for _ in range(n)]
+    samples = []
+    for record in records:
+        start = time.perf_counter()
+        score_live(model, record)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def change_age(at, age):
+    """Move the Age slider and rerun what a browser would in live mode; returns the live run's stages"""
+    at.slider(key='Age').set_value(age)
+    run_fragment(at, ['inputs', 'live'])
+    if at.exception:
+        raise SystemExit(f"app raised: {at.exception[0].message}")
+    return at.session_state.last_timings['live']
+
+
+def live_panel_ms(changes):
+    """Live panel run time (ms, debounce wait excluded) per spaced change, and the waits in a burst"""
+    at = AppTest.from_file(os.path.join(ROOT, "app6.py"), default_timeout=60)
+    at.run()
+    at.toggle(key='live_mode').set_value(True)
+    at.run()
+
+    samples = []
+    for i in range(changes):
+        time.sleep(LIVE_DEBOUNCE_SECONDS)
+        stages = change_age(at, 30 + i % 40)
+        samples.append((stages['fragment:live'] - stages['live_debounce']) * 1000)
+    burst_waits = [change_age(at, 80 + i)['live_debounce'] * 1000 for i in range(5)]
+    return samples, burst_waits
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=20000, help="fast path samples")
+    parser.add_argument("--changes", type=int, default=40, help="spaced input changes in the app")
+    parser.add_argument("--fast-budget-ms", type=float, default=1.0, help="p95 budget of score_live")
+    parser.add_argument("--panel-budget-ms", type=float, default=10.0, help="p95 budget of the live panel rerun")
+    args = parser.parse_args()
+
+    failures = []
+    p50, p95 = percentiles(fast_path_ms(args.records))
+    print(f"{'fast path (score_live)':<28}p50 {p50:8.3f} ms   p95 {p95:8.3f} ms   budget {args.fast_budget_ms} ms")
+    if p95 > args.fast_budget_ms:
+        failures.append("fast path")
+
+    samples, burst_waits = live_panel_ms(args.changes)
+    p50, p95 = percentiles(samples)
+    print(f"{'live panel (fragment:live)':<28}p50 {p50:8.3f} ms   p95 {p95:8.3f} ms   budget {args.panel_budget_ms} ms")
+    if p95 > args.panel_budget_ms:
+        failures.append("live panel")
+
+    print(f"{'burst debounce waits':<28}" + " ".join(f"{ms:.0f}" for ms in burst_waits)
+          + f" ms (interval {LIVE_DEBOUNCE_SECONDS * 1000:.0f} ms)")
+    if not any(burst_waits[1:]):
+        failures.append("debounce")
+
+    if failures:
+        raise SystemExit(f"over budget: {', '.join(failures)}")
+    print("within budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""Local load test for the scoring service in api.py.
+
+Examples:
+
+    # start a server on a free port, hammer /predict, then stop it
+    python benchmarks/loadtest.py --spawn --concurrency 64 --requests 20000
+
+    # against an already running server, with 100-row batches
+    python benchmarks/loadtest.py --port 8000 --batch 100
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from heart_core import (  # noqa: E402
+    AGE_MIN, AGE_MAX, BP_MIN, BP_MAX, CHOL_MIN, CHOL_MAX, HR_MIN, HR_MAX,
+    CATEGORY_LEVELS,
+)
+
+
+def random_record(rng):
+    record = {
+        'Age': rng.randint(AGE_MIN, AGE_MAX),
+        'RestingBP': rng.randint(BP_MIN, BP_MAX),
+        'Cholesterol': rng.randint(CHOL_MIN, CHOL_MAX),
+        'FastingBS': rng.randint(0, 1),
+        'MaxHR': rng.randint(HR_MIN, HR_MAX),
+        'Oldpeak': round(rng.uniform(0.0, 6.0), 1),
+    }
+    for feature, levels in CATEGORY_LEVELS.items():
+        record[feature] = rng.choice(levels)
+    return record
+
+
+def build_request(host, port, path, payload):
+    body = json.dumps(payload).encode()
+    head = (
+        f"POST {path} HTTP/1.1\r\n"
+        f"Host: {host}:{port}\r\n"
+        "Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        "\r\n"
+    ).encode()
+    return head + body
+
+
+async def read_response(reader):
+    head = await reader.readuntil(b"\r\n\r\n")
+    status = int(head.split(b" ", 2)[1])
+    length = 0
+    for line in head.split(b"\r\n"):
+        if line.lower().startswith(b"content-length:"):
+            length = int(line.split(b":", 1)[1])
+    await reader.readexactly(length)
+    return status
+
+
+async def worker(host, port, requests, latencies, errors):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while requests:
+            request = requests.pop()
+            start = time.perf_counter()
+            writer.write(request)
+            status = await read_response(reader)
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                errors.append(status)
+    finally:
+        writer.close()
+
+
+async def run(args):
+    rng = random.Random(0)
+    if args.batch:
+        path = "/predict/batch"
+        payloads = [{"records": [random_record(rng) for _ in range(args.batch)]} for _ in range(64)]
+    else:
+        path = "/predict"
+        payloads = [random_record(rng) for _ in range(1024)]
+    encoded = [build_request(args.host, args.port, path, p) for p in payloads]
+    requests = [encoded[i % len(encoded)] for i in range(args.requests)]
+
+    latencies, errors = [], []
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        worker(args.host, args.port, requests, latencies, errors)
+        for _ in range(args.concurrency)
+    ))
+    elapsed = time.perf_counter() - start
+
+    ms = np.array(latencies) * 1000
+    print(f"endpoint     {path}" + (f" ({args.batch} rows/request)" if args.batch else ""))
+    print(f"requests     {len(ms)}  errors {len(errors)}  concurrency {args.concurrency}")
+    print(f"throughput   {len(ms) / elapsed:,.0f} req/s" +
+          (f"  ({len(ms) * args.batch / elapsed:,.0f} rows/s)" if args.batch else ""))
+    print(f"latency ms   p50 {np.percentile(ms, 50):.2f}  p90 {np.percentile(ms, 90):.2f}  "
+          f"p99 {np.percentile(ms, 99):.2f}  max {ms.max():.2f}")
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for_server(host, port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection((host, port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Server on {host}:{port} did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=10000)
+    parser.add_argument("--batch", type=int, default=0, help="records per /predict/batch call (0 = /predict)")
+    parser.add_argument("--spawn", action="store_true", help="start uvicorn api:app for the run")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers when --spawn is used")
+    args = parser.parse_args()
+
+    server = None
+    if args.spawn:
+        args.port = free_port()
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "api:app", "--host", args.host,
+             "--port", str(args.port), "--workers", str(args.workers), "--log-level", "warning"],
+            cwd=ROOT,
+        )
+    try:
+        if server is not None:
+            wait_for_server(args.host, args.port)
+        asyncio.run(run(args))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""Page weight and per-rerun delta traffic of app6.py.
+
+Drives the app with Streamlit's AppTest and records every ForwardMsg the
+script sends: first load, an input change, a prediction, a full rerun
+and a second identical prediction. Input changes rerun only the inputs
+fragment and a prediction only the result, downloads and trend fragments,
+as in a browser (AppTest itself always runs the whole script; see
+run_fragment). "wire" applies Streamlit's message cache the way a
+connected browser sees it: new_element messages of at least
+global.minCachedMessageSize bytes that the browser already holds are
+sent as a short hash reference. Files under static/ are added to the
+first load only, since the browser caches them after that.
+
+    python benchmarks/page_weight.py
+"""
+import argparse
+import functools
+import os
+import sys
+
+import streamlit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from streamlit.runtime import forward_msg_cache  # noqa: E402
+from streamlit.runtime.forward_msg_queue import ForwardMsgQueue  # noqa: E402
+from streamlit.runtime.scriptrunner import RerunData  # noqa: E402
+from streamlit.testing.v1 import AppTest, local_script_runner  # noqa: E402
+
+STATIC_DIR = os.path.join(ROOT, "static")
+# AppTest has no public fragment rerun; run_fragment uses its internals as
+# they are in these releases (AppTest._fragment_storage appeared in 1.64)
+FRAGMENT_RERUN_VERSIONS = ((1, 64), (1, 65))
+
+
+def record_messages():
+    sent = []
+    enqueue = ForwardMsgQueue.enqueue
+
+    def recording_enqueue(self, msg):
+        sent.append(msg)
+        return enqueue(self, msg)
+
+    ForwardMsgQueue.enqueue = recording_enqueue
+    return sent
+
+
+def static_bytes():
+    total = 0
+    for dirpath, _, filenames in os.walk(STATIC_DIR):
+        total += sum(os.path.getsize(os.path.join(dirpath, f)) for f in filenames)
+    return total
+
+
+def measure(sent, browser_cache):
+    raw = wire = 0
+    for msg in sent:
+        forward_msg_cache.populate_hash_if_needed(msg)
+        size = msg.ByteSize()
+        raw += size
+        if msg.metadata.cacheable and msg.hash in browser_cache:
+            wire += forward_msg_cache.create_reference_msg(msg).ByteSize()
+        else:
+            wire += size
+            if msg.metadata.cacheable:
+                browser_cache.add(msg.hash)
+    return raw, wire
+
+
+def click(at, label):
+    next(b for b in at.button if label in b.label).click()
+
+
+def check_fragment_internals(at):
+    version = tuple(int(part) for part in streamlit.__version__.split(".")[:2])
+    low, high = FRAGMENT_RERUN_VERSIONS
+    if not low <= version <= high or not hasattr(at, "_fragment_storage") \
+            or not hasattr(local_script_runner, "RerunData"):
+        raise SystemExit(
+            f"run_fragment relies on AppTest internals of streamlit {low[0]}.{low[1]}-{high[0]}.{high[1]}, "
+            f"found {streamlit.__version__}; check them against this release and update FRAGMENT_RERUN_VERSIONS"
+        )
+
+
+def run_fragment(at, key):
+    """Run only the fragment registered with st.fragment(key=key), like a widget change inside it
+
+    Exits with a message on streamlit releases outside FRAGMENT_RERUN_VERSIONS.
+    """
+    check_fragment_internals(at)
+    fragment_ids = at._fragment_storage.resolve_target(key)
+    local_script_runner.RerunData = functools.partial(
+        RerunData, fragment_id_queue=fragment_ids, is_fragment_scoped_rerun=True
+    )
+    try:
+        at.run()
+    finally:
+        local_script_runner.RerunData = RerunData
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.parse_args()
+
+    sent = record_messages()
+    at = AppTest.from_file(os.path.join(ROOT, "app6.py"), default_timeout=60)
+    no_action = lambda: None  # noqa: E731
+    steps = [
+        ("first load", no_action, at.run),
+        ("input change", lambda: at.number_input[0].increment(), lambda: run_fragment(at, "inputs")),
+        ("prediction", lambda: click(at, "ANALYZE"), at.run),
+        ("full rerun", no_action, at.run),
+        ("same prediction again", lambda: click(at, "ANALYZE"), at.run),
+    ]
+
+    browser_cache = set()
+    print(f"{'run':<24}{'messages':>10}{'raw KB':>10}{'wire KB':>10}")
+    for name, action, run in steps:
+        action()
+        sent.clear()
+        run()
+        if at.exception:
+            raise SystemExit(f"app raised during '{name}': {at.exception[0].message}")
+        raw, wire = measure(sent, browser_cache)
+        if name == "first load":
+            raw += static_bytes()
+            wire += static_bytes()
+        print(f"{name:<24}{len(sent):>10}{raw / 1000:>10.1f}{wire / 1000:>10.1f}")
+    print(f"\nstatic assets (first load only): {static_bytes() / 1000:.1f} KB")
+
+
+if __name__ == "__main__":
+    main()
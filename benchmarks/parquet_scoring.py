@@ -0,0 +1,93 @@
+"""Batch scoring throughput and peak memory: score_csv vs score_parquet.
+
+Writes the same random patients as a CSV and as a Parquet file with
+--row-group-rows rows per row group, then scores each in a fresh
+process so peak RSS (VmHWM) covers that path alone. "loaded" is the
+RSS once the model is loaded, before reading any input.
+
+    python benchmarks/parquet_scoring.py --rows 1000000
+"""
+import argparse
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import heart_core  # noqa: E402
+from loadtest import random_record  # noqa: E402
+
+
+def rss_mb():
+    """Peak RSS of this process; ru_maxrss survives exec, so it would include the parent's"""
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def write_inputs(directory, rows, row_group_rows):
+    import pandas as pd
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    rng = random.Random(0)
+    df = pd.DataFrame([random_record(rng) for _ in range(rows)], columns=heart_core.INPUT_FEATURES)
+    csv_path = os.path.join(directory, "patients.csv")
+    parquet_path = os.path.join(directory, "patients.parquet")
+    df.to_csv(csv_path, index=False)
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), parquet_path, row_group_size=row_group_rows)
+    return {'csv': csv_path, 'parquet': parquet_path}
+
+
+def score(fmt, path, out_path):
+    """Child process: score path into out_path and print rows, seconds, loaded and peak RSS"""
+    model = heart_core.ModelRegistry(poll_interval=0).current
+    loaded = rss_mb()
+    start = time.perf_counter()
+    if fmt == 'csv':
+        with open(out_path, "w", encoding="utf-8", newline="") as out_file:
+            rows = heart_core.score_csv(path, out_file, model)
+    else:
+        rows = heart_core.score_parquet(path, out_path, model)
+    print(rows, time.perf_counter() - start, loaded, rss_mb())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=500000)
+    parser.add_argument("--row-group-rows", type=int, default=heart_core.BATCH_CHUNK_ROWS)
+    parser.add_argument("--score", nargs=3, metavar=("FORMAT", "INPUT", "OUTPUT"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.score:
+        score(*args.score)
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        inputs = write_inputs(directory, args.rows, args.row_group_rows)
+        print(f"{args.rows:,} rows, {args.row_group_rows:,} per chunk / row group")
+        for fmt, path in inputs.items():
+            out_path = os.path.join(directory, f"scored.{fmt}")
+            result = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--score", fmt, path, out_path],
+                check=True, capture_output=True, text=True
+            )
+            rows, seconds, loaded, peak = (float(value) for value in result.stdout.split())
+            print(
+                f"{fmt:<8}{rows / seconds:>12,.0f} rows/sec {seconds:8.2f}s   "
+                f"peak RSS {peak:7.1f} MB (loaded {loaded:.1f} MB)   "
+                f"in {os.path.getsize(path) / 2**20:6.1f} MB  out {os.path.getsize(out_path) / 2**20:6.1f} MB"
+            )
+
+
+if __name__ == "__main__":
+    main()
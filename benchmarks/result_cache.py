@@ -0,0 +1,94 @@
+"""Cost per prediction with and without heart_core.ResultCache.
+
+Each request scores one record and renders its PDF report, as an
+ANALYZE click followed by a download does in app6.py. A --repeat-share
+fraction of requests repeat an input from a small popular set (the
+default record among them); the rest are random. The cached run keeps
+results and report bytes in a ResultCache of --max-bytes.
+
+    python benchmarks/result_cache.py --requests 2000 --max-bytes 1000000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import heart_core  # noqa: E402
+from heart_core import ResultCache, get_health_levels, get_risk_category, input_key  # noqa: E402
+from loadtest import random_record  # noqa: E402
+from reports import PredictionReport, build_report_fields  # noqa: E402
+
+ENTRY_BYTES = 2048
+
+
+def compute(model, record):
+    prediction, risk_score = model.score(record)
+    risk_label, _, _ = get_risk_category(risk_score, prediction)
+    health = get_health_levels(record['RestingBP'], record['Cholesterol'], record['MaxHR'], record['FastingBS'])
+    report = PredictionReport(build_report_fields(record, risk_label, risk_score, health, model.version))
+    return {'prediction': prediction, 'risk_score': risk_score, 'risk_label': risk_label, 'report': report}
+
+
+def serve(model, record, cache):
+    if cache is None:
+        return compute(model, record)['report'].pdf_bytes()
+    key = input_key(record, model.version)
+    result = cache.get(key)
+    if result is None:
+        result = compute(model, record)
+        report = result['report']
+        report.on_render = lambda: cache.resize(key, ENTRY_BYTES + report.nbytes)
+        cache.put(key, result, ENTRY_BYTES)
+    return result['report'].pdf_bytes()
+
+
+def workload(n, repeat_share, popular):
+    rng = random.Random(0)
+    favourites = [dict(heart_core.DEFAULT_RECORD)] + [random_record(rng) for _ in range(popular - 1)]
+    return [rng.choice(favourites) if rng.random() < repeat_share else random_record(rng) for _ in range(n)]
+
+
+def timed(model, records, cache):
+    samples = []
+    for record in records:
+        start = time.perf_counter()
+        serve(model, record, cache)
+        samples.append((time.perf_counter() - start) * 1000)
+    return np.array(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--repeat-share", type=float, default=0.6, help="fraction of requests with a popular input")
+    parser.add_argument("--popular", type=int, default=20, help="distinct popular inputs")
+    parser.add_argument("--max-bytes", type=int, default=heart_core.RESULT_CACHE_BYTES)
+    args = parser.parse_args()
+
+    model = heart_core.ModelRegistry(poll_interval=0).current
+    records = workload(args.requests, args.repeat_share, args.popular)
+    serve(model, records[0], None)  # PDF template, imports
+
+    cache = ResultCache(args.max_bytes)
+    for name, run_cache in (("uncached", None), ("cached", cache)):
+        ms = timed(model, records, run_cache)
+        print(
+            f"{name:<10}mean {ms.mean():7.3f} ms   p50 {np.percentile(ms, 50):7.3f} ms   "
+            f"p95 {np.percentile(ms, 95):7.3f} ms   total {ms.sum() / 1000:6.2f}s"
+        )
+    stats = cache.stats()
+    print(
+        f"cache: {stats['hits']:,} hits / {stats['misses']:,} misses ({stats['hit_rate']:.0%}), "
+        f"{stats['entries']:,} entries, {stats['bytes']:,} / {stats['max_bytes']:,} bytes, "
+        f"{stats['evictions']:,} evictions"
+    )
+
+
+if __name__ == "__main__":
+    main()
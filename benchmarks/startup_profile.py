@@ -0,0 +1,109 @@
+"""Cold-start profile of app6.py.
+
+Runs the app script once in a fresh interpreter (Streamlit "bare mode",
+no server) under ``-X importtime`` and reports:
+
+* total cold-start time of the script,
+* the slowest top-level imports,
+* the artifact-load breakdown recorded by heart_core.load_artifacts(),
+* which deferred modules were imported anyway.
+
+With --budget-ms it exits non-zero when cold start is over budget, and
+with --forbid it exits non-zero if any listed module was imported, so it
+can gate CI (tests/test_startup.py runs the same check through run()):
+
+    python benchmarks/startup_profile.py --budget-ms 3000 --forbid fpdf joblib sklearn
+
+plotly cannot be forbidden: streamlit imports it itself.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+WATCHED_MODULES = ["plotly", "fpdf", "sklearn", "joblib", "pandas", "pyarrow"]
+
+CHILD = """
+import json, logging, runpy, sys, time
+logging.disable(logging.WARNING)
+start = time.perf_counter()
+app = runpy.run_path("app6.py")
+total = time.perf_counter() - start
+print(json.dumps({
+    "total": total,
+    "stages": app["run_timer"].stages,
+    "modules": sorted({name.split(".")[0] for name in sys.modules}),
+}))
+"""
+
+
+def parse_importtime(stderr):
+    """Cumulative microseconds per top-level package from -X importtime output"""
+    totals = defaultdict(int)
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if name.startswith("  "):
+            continue  # nested import, already counted in its parent
+        totals[name.strip().split(".")[0]] += int(cumulative)
+    return totals
+
+
+def profile():
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHILD],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        sys.stderr.write(proc.stderr)
+        raise SystemExit(f"app6.py failed to start (exit {proc.returncode})")
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result["imports"] = parse_importtime(proc.stderr)
+    return result
+
+
+def run(budget_ms=None, forbid=()):
+    """Profile one cold start; returns (result, failures), failures empty when within budget"""
+    result = profile()
+    failures = []
+    total_ms = result["total"] * 1000
+    if budget_ms is not None and total_ms > budget_ms:
+        failures.append(f"cold start {total_ms:.0f} ms is over the {budget_ms:.0f} ms budget")
+    imported = [m for m in forbid if m in result["modules"]]
+    if imported:
+        failures.append("deferred modules imported at startup: " + ", ".join(imported))
+    return result, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budget-ms", type=float, help="fail if cold start exceeds this")
+    parser.add_argument("--forbid", nargs="*", default=[], help="fail if any of these modules is imported")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    result, failures = run(args.budget_ms, args.forbid)
+    total_ms = result["total"] * 1000
+
+    print(f"cold start      {total_ms:8.1f} ms")
+    print("\nslowest imports (cumulative)")
+    for name, us in sorted(result["imports"].items(), key=lambda kv: kv[1], reverse=True)[:args.top]:
+        print(f"  {name:<20} {us / 1000:8.1f} ms")
+    print("\nartifact load")
+    for name, seconds in result["stages"].items():
+        print(f"  {name:<20} {seconds * 1000:8.1f} ms")
+    watched = [m for m in WATCHED_MODULES if m in result["modules"]]
+    print("\nimported at startup: " + (", ".join(watched) or "-"))
+
+    for failure in failures:
+        print("FAIL: " + failure)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,356 @@
+"""Plotly figures for the risk gauge, trend, what-if and cohort charts, built from cached templates.
+
+Building and validating a go.Figure costs several ms per chart. The
+static parts of each figure are built and validated once per process;
+a request only patches the value, threshold or data into a plain dict,
+and the finished figure is cached so a rerun with unchanged data reuses
+it as is. st.plotly_chart still serializes the dict to JSON on every
+call, cached or not; Streamlit offers no way to hand it a prebuilt spec.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import plotly.graph_objects as go
+
+GAUGE_CACHE_SIZE = 256
+TREND_CACHE_SIZE = 64
+SWEEP_CACHE_SIZE = 64
+COHORT_CACHE_SIZE = 16
+# Markers are only drawn on short series
+TREND_MARKER_POINTS = 60
+
+
+class FrozenFigure(go.Figure):
+    """Figure whose serialized form is a prebuilt dict
+
+    to_dict() (which st.plotly_chart and plotly.io.to_json go through)
+    returns that dict without copying or validating it, so it must never
+    be mutated; the Figure object itself stays empty. Only the build and
+    validation are saved: the caller's JSON serialization still runs.
+    """
+
+    def __init__(self, spec):
+        super().__init__(_validate=False)
+        self._spec = spec
+
+    def to_dict(self):
+        return self._spec
+
+
+class FigureCache:
+    """Small thread-safe LRU of FrozenFigures shared by all sessions"""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._figures = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, build):
+        with self._lock:
+            figure = self._figures.get(key)
+            if figure is not None:
+                self._figures.move_to_end(key)
+                self.hits += 1
+                return figure
+        figure = build()
+        with self._lock:
+            self.misses += 1
+            self._figures[key] = figure
+            if len(self._figures) > self.maxsize:
+                self._figures.popitem(last=False)
+        return figure
+
+
+_templates = {}
+_templates_lock = threading.Lock()
+gauge_cache = FigureCache(GAUGE_CACHE_SIZE)
+trend_cache = FigureCache(TREND_CACHE_SIZE)
+sweep_cache = FigureCache(SWEEP_CACHE_SIZE)
+cohort_cache = FigureCache(COHORT_CACHE_SIZE)
+
+
+def _template(name, build):
+    """Validated to_dict() of a figure, built once per process"""
+    if name not in _templates:
+        with _templates_lock:
+            if name not in _templates:
+                _templates[name] = build().to_dict()
+    return _templates[name]
+
+
+# ------------------------ GAUGE ------------------------ #
+def _build_gauge():
+    fig = go.Figure(go.Indicator(
+        mode="gauge+number",
+        value=0,
+        title={'text': "Estimated Risk (%)", 'font': {'size': 18, 'color': '#f1f5f9'}},
+        number={'font': {'size': 36, 'color': '#f1f5f9'}},
+        gauge={
+            'axis': {'range': [0, 100], 'tickcolor': '#94a3b8'},
+            'bar': {'thickness': 0.35, 'color': '#ec4899'},
+            'bgcolor': 'rgba(15, 23, 42, 0.5)',
+            'steps': [
+                {'range': [0, 20], 'color': "#065f46"},
+                {'range': [20, 50], 'color': "#713f12"},
+                {'range': [50, 100], 'color': "#7f1d1d"},
+            ],
+            'threshold': {
+                'line': {'color': "#f1f5f9", 'width': 3},
+                'thickness': 0.75,
+                'value': 0
+            }
+        }
+    ))
+    fig.update_layout(
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        font={'color': '#f1f5f9'},
+        margin=dict(l=20, r=20, t=50, b=20),
+        height=280,
+        autosize=True
+    )
+    return fig
+
+
+def _patch_gauge(value):
+    template = _template('gauge', _build_gauge)
+    trace = dict(template['data'][0], value=value)
+    gauge = dict(trace['gauge'])
+    gauge['threshold'] = dict(gauge['threshold'], value=value)
+    trace['gauge'] = gauge
+    return FrozenFigure({'data': [trace], 'layout': template['layout']})
+
+
+def gauge_figure(value):
+    value = float(value)
+    return gauge_cache.get(value, lambda: _patch_gauge(value))
+
+
+# ------------------------ TREND ------------------------ #
+def _build_trend():
+    fig = go.Figure(go.Scatter(
+        x=[],
+        y=[],
+        mode='lines+markers',
+        name='Risk Score',
+        line=dict(color='#ec4899', width=3),
+        marker=dict(size=10, color='#ec4899', line=dict(color='#fff', width=2))
+    ))
+    fig.update_layout(
+        title='Risk Score Over Time',
+        xaxis_title='Time',
+        yaxis_title='Risk Score (%)',
+        xaxis=dict(type='date'),
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(15, 23, 42, 0.5)',
+        font={'color': '#f1f5f9'},
+        height=300,
+        margin=dict(l=20, r=20, t=40, b=20),
+        yaxis=dict(range=[0, 100]),
+        autosize=True
+    )
+    return fig
+
+
+def _patch_trend(times, scores):
+    template = _template('trend', _build_trend)
+    trace = dict(
+        template['data'][0],
+        x=np.datetime_as_string(times, unit='ms').tolist(),
+        y=np.round(scores.astype(np.float64), 1).tolist(),
+        mode='lines+markers' if len(times) <= TREND_MARKER_POINTS else 'lines',
+    )
+    return FrozenFigure({'data': [trace], 'layout': template['layout']})
+
+
+def trend_figure(times, scores):
+    """Trend figure for datetime64 times and float scores, reused while the data is unchanged"""
+    times = np.asarray(times, dtype='datetime64[ns]')
+    scores = np.asarray(scores, dtype=np.float32)
+    key = hashlib.blake2b(times.tobytes() + scores.tobytes(), digest_size=16).digest()
+    return trend_cache.get(key, lambda: _patch_trend(times, scores))
+
+
+# ------------------------ WHAT-IF ------------------------ #
+CURRENT_MARKER = dict(size=14, color='#f1f5f9', symbol='x', line=dict(color='#0f172a', width=2))
+
+
+def _sweep_layout():
+    return dict(
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(15, 23, 42, 0.5)',
+        font={'color': '#f1f5f9'},
+        height=340,
+        margin=dict(l=20, r=20, t=40, b=20),
+        showlegend=False,
+        autosize=True
+    )
+
+
+def _build_sweep_curve():
+    fig = go.Figure([
+        go.Scatter(x=[], y=[], mode='lines', name='Risk Score', line=dict(color='#ec4899', width=3)),
+        go.Scatter(x=[], y=[], mode='markers', name='You', marker=CURRENT_MARKER),
+    ])
+    fig.update_layout(yaxis=dict(title='Risk Score (%)', range=[0, 100]), **_sweep_layout())
+    return fig
+
+
+def _build_sweep_heatmap():
+    fig = go.Figure([
+        go.Heatmap(
+            x=[], y=[], z=[], zmin=0, zmax=100,
+            colorscale=[[0, '#065f46'], [0.2, '#713f12'], [0.5, '#7f1d1d'], [1, '#ec4899']],
+            colorbar=dict(title='Risk %'),
+            hovertemplate='%{x}, %{y}: %{z}%<extra></extra>'
+        ),
+        go.Scatter(x=[], y=[], mode='markers', name='You', marker=CURRENT_MARKER),
+    ])
+    fig.update_layout(**_sweep_layout())
+    return fig
+
+
+def _axis(template, name, title):
+    return dict(template['layout'].get(name, {}), title={'text': title})
+
+
+def _patch_sweep(labels, axes, risks, current, current_risk):
+    risks = np.round(risks, 1)
+    if len(axes) == 1:
+        template = _template('sweep_curve', _build_sweep_curve)
+        curve = dict(template['data'][0], x=axes[0].tolist(), y=risks.tolist())
+        point = dict(template['data'][1], x=[current[0]], y=[round(current_risk, 1)])
+        layout = dict(template['layout'], xaxis=_axis(template, 'xaxis', labels[0]))
+        return FrozenFigure({'data': [curve, point], 'layout': layout})
+
+    template = _template('sweep_heatmap', _build_sweep_heatmap)
+    # Heatmap rows run along y, so the second feature's axis comes first
+    heatmap = dict(template['data'][0], x=axes[0].tolist(), y=axes[1].tolist(), z=risks.T.tolist())
+    point = dict(template['data'][1], x=[current[0]], y=[current[1]])
+    layout = dict(
+        template['layout'],
+        xaxis=_axis(template, 'xaxis', labels[0]),
+        yaxis=_axis(template, 'yaxis', labels[1]),
+    )
+    return FrozenFigure({'data': [heatmap, point], 'layout': layout})
+
+
+def sweep_figure(labels, axes, risks, current, current_risk):
+    """Risk curve (one feature) or heatmap (two) of a what-if sweep, with the current inputs marked
+
+    labels and axes hold each varied feature's axis title and grid values,
+    current its value in the user's inputs and current_risk their score.
+    """
+    axes = [np.asarray(values, dtype=np.float64) for values in axes]
+    risks = np.asarray(risks, dtype=np.float64)
+    digest = hashlib.blake2b(risks.tobytes(), digest_size=16)
+    for values in axes:
+        digest.update(values.tobytes())
+    key = (tuple(labels), tuple(current), current_risk, digest.digest())
+    return sweep_cache.get(key, lambda: _patch_sweep(labels, axes, risks, current, current_risk))
+
+
+# ------------------------ COHORT ------------------------ #
+# Gauge band colours, for risk below 20%, below 50% and above
+RISK_BAND_COLORS = np.array(['#065f46', '#713f12', '#7f1d1d'])
+
+
+def _cohort_layout(title):
+    return dict(
+        title=title,
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(15, 23, 42, 0.5)',
+        font={'color': '#f1f5f9'},
+        height=300,
+        margin=dict(l=20, r=20, t=40, b=20),
+        showlegend=False,
+        autosize=True
+    )
+
+
+def _build_cohort_histogram():
+    fig = go.Figure(go.Bar(
+        x=[], y=[], marker=dict(line=dict(width=0)),
+        hovertemplate='%{x}%: %{y:,} patients<extra></extra>'
+    ))
+    fig.update_layout(
+        xaxis=dict(title='Risk Score (%)', range=[0, 100]), yaxis=dict(title='Patients'), bargap=0.05,
+        **_cohort_layout('Risk Distribution')
+    )
+    return fig
+
+
+def _build_cohort_group():
+    fig = go.Figure(go.Bar(
+        x=[], y=[], marker=dict(color='#ec4899'),
+        hovertemplate='%{x}: %{y}% mean risk, %{customdata:,} patients<extra></extra>'
+    ))
+    fig.update_layout(yaxis=dict(title='Mean Risk Score (%)', range=[0, 100]), **_cohort_layout(''))
+    return fig
+
+
+def _build_cohort_scatter():
+    # WebGL, so a few thousand points stay responsive
+    fig = go.Figure(go.Scattergl(
+        x=[], y=[], mode='markers', marker=dict(size=4, color='#ec4899', opacity=0.35),
+        hovertemplate='Age %{x}: %{y}%<extra></extra>'
+    ))
+    fig.update_layout(
+        xaxis=dict(title='Age'), yaxis=dict(title='Risk Score (%)', range=[0, 100]),
+        **_cohort_layout('Age vs Risk')
+    )
+    return fig
+
+
+def _rounded(values):
+    return np.round(np.asarray(values, dtype=np.float64), 1).tolist()
+
+
+def _patch_cohort(summary, labels):
+    bins = summary['risk_bins']
+    template = _template('cohort_histogram', _build_cohort_histogram)
+    bands = np.digitize(bins[:-1], [20, 50])
+    histogram = dict(
+        template['data'][0],
+        x=_rounded((bins[:-1] + bins[1:]) / 2),
+        y=summary['risk_counts'].tolist(),
+        width=float(bins[1] - bins[0]),
+        marker=dict(template['data'][0]['marker'], color=RISK_BAND_COLORS[bands].tolist()),
+    )
+    figures = {'histogram': FrozenFigure({'data': [histogram], 'layout': template['layout']})}
+
+    template = _template('cohort_group', _build_cohort_group)
+    for feature, group in summary['groups'].items():
+        bar = dict(
+            template['data'][0],
+            x=list(group['levels']),
+            y=[None if np.isnan(v) else v for v in _rounded(group['mean_risk'])],
+            customdata=group['counts'].tolist(),
+        )
+        layout = dict(template['layout'], title={'text': f"Risk by {labels.get(feature, feature)}"})
+        figures[feature] = FrozenFigure({'data': [bar], 'layout': layout})
+
+    template = _template('cohort_scatter', _build_cohort_scatter)
+    scatter = dict(template['data'][0], x=_rounded(summary['sample_age']), y=_rounded(summary['sample_risk']))
+    sampled = len(summary['sample_age'])
+    title = "Age vs Risk" + (
+        f" ({sampled:,} of {summary['rows'] - summary['invalid']:,} patients)"
+        if sampled < summary['rows'] - summary['invalid'] else ""
+    )
+    layout = dict(template['layout'], title={'text': title})
+    figures['scatter'] = FrozenFigure({'data': [scatter], 'layout': layout})
+    return figures
+
+
+def cohort_figures(key, summary, labels=None):
+    """Histogram, per-feature and age-vs-risk figures of a heart_core.CohortAggregator summary
+
+    Returns {'histogram', <each group feature>, 'scatter'}; the payload is
+    bounded by the summary, not the batch size. key identifies the scored
+    dataset, and the figures are reused for as long as it is cached.
+    """
+    return cohort_cache.get(key, lambda: _patch_cohort(summary, labels or {}))
@@ -0,0 +1,42 @@
+"""Export the pickled model artifacts as a single versioned model bundle.
+
+    python export_bundle.py                      # Heart_*.pkl -> Heart_model.bundle
+    python export_bundle.py --version 2025-06-01 --out /models/Heart_model.bundle
+
+Needs scikit-learn and joblib to read the pickles; loading the bundle
+afterwards needs neither.
+"""
+import argparse
+import os
+
+import numpy as np
+
+import heart_core
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model-dir", default=heart_core.MODEL_DIR, help="directory with the Heart_*.pkl files")
+    parser.add_argument("--out", help="bundle path (default: <model-dir>/%s)" % heart_core.BUNDLE_FILE)
+    parser.add_argument("--version", help="model version label (default: content hash)")
+    args = parser.parse_args()
+
+    out = args.out or os.path.join(args.model_dir, heart_core.BUNDLE_FILE)
+    source = heart_core.load_pickles(args.model_dir)
+    version = heart_core.write_bundle(
+        source, out, version=args.version, source_digest=heart_core.pickle_digest(args.model_dir)
+    )
+
+    # Round-trip check against the pickled pipeline before declaring success
+    bundle = heart_core.load_bundle(out)
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(1000, len(source.expected_columns)))
+    if not np.array_equal(source.predictor.predict_proba(X), bundle.predictor.predict_proba(X)):
+        os.remove(out)
+        raise SystemExit("Bundle predictions differ from the pickled model; bundle removed")
+
+    print(f"Wrote {out} ({os.path.getsize(out)} bytes), version {version}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1262 @@
+"""Scoring core shared by the Streamlit app and the HTTP service."""
+import hashlib
+import importlib.util
+import io
+import json
+import logging
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+# Constants
+AGE_MIN, AGE_MAX, AGE_DEFAULT = 18, 100, 40
+BP_MIN, BP_MAX, BP_DEFAULT = 80, 200, 120
+CHOL_MIN, CHOL_MAX, CHOL_DEFAULT = 100, 600, 200
+HR_MIN, HR_MAX, HR_DEFAULT = 60, 220, 150
+OLDPEAK_MIN, OLDPEAK_MAX, OLDPEAK_DEFAULT = 0.0, 6.0, 1.0
+
+NUMERIC_FEATURES = ['Age', 'RestingBP', 'Cholesterol', 'FastingBS', 'MaxHR', 'Oldpeak']
+CATEGORY_LEVELS = {
+    'Sex': ["M", "F"],
+    'ChestPainType': ["ATA", "NAP", "TA", "ASY"],
+    'RestingECG': ["Normal", "ST", "LVH"],
+    'ExerciseAngina': ["Y", "N"],
+    'ST_Slope': ["Up", "Flat", "Down"],
+}
+CATEGORICAL_FEATURES = list(CATEGORY_LEVELS)
+INPUT_FEATURES = NUMERIC_FEATURES + CATEGORICAL_FEATURES
+FEATURE_LABELS = {
+    'Age': "Age",
+    'RestingBP': "Resting BP",
+    'Cholesterol': "Cholesterol",
+    'FastingBS': "Fasting Blood Sugar",
+    'MaxHR': "Max Heart Rate",
+    'Oldpeak': "Oldpeak",
+    'Sex': "Sex",
+    'ChestPainType': "Chest Pain Type",
+    'RestingECG': "Resting ECG",
+    'ExerciseAngina': "Exercise Angina",
+    'ST_Slope': "ST Slope",
+}
+BATCH_CHUNK_ROWS = 5000
+
+# Inputs shown in the UI before the user changes anything
+DEFAULT_RECORD = {
+    'Age': AGE_DEFAULT,
+    'RestingBP': BP_DEFAULT,
+    'Cholesterol': CHOL_DEFAULT,
+    'FastingBS': 0,
+    'MaxHR': HR_DEFAULT,
+    'Oldpeak': OLDPEAK_DEFAULT,
+    **{feature: levels[0] for feature, levels in CATEGORY_LEVELS.items()},
+}
+
+# Input range of each numeric feature a what-if sweep can vary
+SWEEP_RANGES = {
+    'Age': (AGE_MIN, AGE_MAX),
+    'RestingBP': (BP_MIN, BP_MAX),
+    'Cholesterol': (CHOL_MIN, CHOL_MAX),
+    'MaxHR': (HR_MIN, HR_MAX),
+    'Oldpeak': (OLDPEAK_MIN, OLDPEAK_MAX),
+}
+
+
+def sweep_values(feature, points):
+    """Up to `points` evenly spaced values over the feature's SWEEP_RANGES, whole numbers for integer inputs"""
+    low, high = SWEEP_RANGES[feature]
+    values = np.linspace(low, high, points)
+    if isinstance(low, int):
+        values = np.unique(np.round(values))
+    return values
+
+
+# Risk score (%) bands used for the Low / Moderate / High categories
+MODERATE_RISK_THRESHOLD = 20
+HIGH_RISK_THRESHOLD = 50
+# Batch risk_category labels, indexed by the category codes HeartModel computes
+RISK_CATEGORY_LABELS = np.array(["Invalid Input", "Low Risk", "Moderate Risk", "High Risk"])
+
+MODEL_FILE = "Heart_LR.pkl"
+SCALER_FILE = "Heart_scaler.pkl"
+COLUMNS_FILE = "Heart_column.pkl"
+BUNDLE_FILE = "Heart_model.bundle"
+REFERENCE_COHORT_FILE = "reference_cohort.csv"
+logger = logging.getLogger(__name__)
+
+MODEL_DIR = os.environ.get("HEART_MODEL_DIR", os.path.dirname(os.path.abspath(__file__)))
+# Patients (same columns as a batch CSV) that predictions are ranked against
+REFERENCE_COHORT = os.environ.get("HEART_REFERENCE_COHORT", os.path.join(MODEL_DIR, REFERENCE_COHORT_FILE))
+# Byte budget of the process-wide ResultCache
+RESULT_CACHE_BYTES = int(os.environ.get("HEART_RESULT_CACHE_BYTES", 64 * 2**20))
+# Parquet batch scoring (score_parquet) needs pyarrow
+PARQUET_AVAILABLE = importlib.util.find_spec("pyarrow") is not None
+
+# ------------------------ MODEL ------------------------ #
+class LinearParams:
+    """Raw StandardScaler + binary LogisticRegression parameters, one entry per column"""
+
+    def __init__(self, coef, intercept, mean, scale, classes):
+        self.coef = np.asarray(coef, dtype=np.float64).ravel()
+        self.intercept = float(intercept)
+        self.mean = np.asarray(mean, dtype=np.float64).ravel()
+        self.scale = np.asarray(scale, dtype=np.float64).ravel()
+        self.classes = np.asarray(classes)
+        n = len(self.coef)
+        if len(self.mean) != n or len(self.scale) != n or len(self.classes) != 2:
+            raise ValueError("Inconsistent model parameter shapes")
+
+    @classmethod
+    def from_sklearn(cls, model, scaler):
+        n = model.coef_.shape[-1]
+        return cls(
+            coef=model.coef_,
+            intercept=model.intercept_[0],
+            mean=scaler.mean_ if scaler.mean_ is not None else np.zeros(n),
+            scale=scaler.scale_ if scaler.scale_ is not None else np.ones(n),
+            classes=model.classes_,
+        )
+
+
+class FusedPredictor:
+    """StandardScaler + binary LogisticRegression folded into one linear model"""
+
+    def __init__(self, params):
+        self.coef = params.coef / params.scale
+        self.intercept = params.intercept - float(np.dot(params.mean, self.coef))
+        self.classes = params.classes
+
+    def decision_function(self, X):
+        return np.dot(X, self.coef) + self.intercept
+
+    def predict_proba(self, X):
+        """Probability of the positive class for one row (1-D) or a batch (2-D)"""
+        return np.exp(-np.logaddexp(0.0, -self.decision_function(X)))
+
+    def predict(self, X):
+        return self.classes[(self.decision_function(X) > 0).astype(int)]
+
+
+def normalize_level(value):
+    """Category value as matched against CATEGORY_LEVELS, the same way for one record or a whole batch"""
+    return str(value).strip()
+
+
+class FeatureEncoder:
+    """Maps raw inputs straight into the expected_columns layout by index"""
+
+    def __init__(self, expected_columns):
+        self.columns = list(expected_columns)
+        index = {col: j for j, col in enumerate(self.columns)}
+        missing = [col for col in NUMERIC_FEATURES if col not in index]
+        if missing:
+            raise ValueError("Expected columns lack numeric features: " + ", ".join(missing))
+        self.numeric_index = np.array([index[col] for col in NUMERIC_FEATURES])
+
+        # Per feature, the column index of each level; -1 marks the dropped baseline level
+        self.level_index = {}
+        self.level_columns = {}
+        known = set(NUMERIC_FEATURES)
+        for feature, levels in CATEGORY_LEVELS.items():
+            cols = [index.get(f"{feature}_{level}", -1) for level in levels]
+            self.level_index[feature] = dict(zip(levels, cols))
+            self.level_columns[feature] = np.array(cols)
+            known.update(f"{feature}_{level}" for level in levels)
+        unknown = [col for col in self.columns if col not in known]
+        if unknown:
+            raise ValueError("Expected columns contain unknown categories: " + ", ".join(unknown))
+
+        self._local = threading.local()
+
+    def _lookup(self, feature, value):
+        try:
+            return self.level_index[feature][normalize_level(value)]
+        except KeyError:
+            raise ValueError(
+                f"Unknown {feature} value {value!r}; expected one of {CATEGORY_LEVELS[feature]}"
+            ) from None
+
+    def encode(self, data, out=None):
+        """Encode a dict (one row, 1-D result) or a DataFrame (N rows, 2-D result)
+
+        The one-row result is a per-thread buffer that is overwritten by the
+        next call, so use it before encoding again.
+        """
+        if isinstance(data, pd.DataFrame):
+            return self._encode_frame(data, out)
+
+        row = out
+        if row is None:
+            row = getattr(self._local, 'row', None)
+            if row is None:
+                row = self._local.row = np.zeros(len(self.columns), dtype=np.float64)
+        row.fill(0.0)
+        try:
+            for feature, j in zip(NUMERIC_FEATURES, self.numeric_index):
+                row[j] = data[feature]
+            for feature in CATEGORICAL_FEATURES:
+                j = self._lookup(feature, data[feature])
+                if j >= 0:
+                    row[j] = 1.0
+        except KeyError as e:
+            raise ValueError(f"Missing required field {e}") from None
+        return row
+
+    def _encode_frame(self, df, out=None):
+        missing = [col for col in INPUT_FEATURES if col not in df.columns]
+        if missing:
+            raise ValueError("Missing required columns: " + ", ".join(missing))
+
+        n = len(df)
+        X = out if out is not None else np.empty((n, len(self.columns)), dtype=np.float64)
+        X.fill(0.0)
+        for feature, j in zip(NUMERIC_FEATURES, self.numeric_index):
+            X[:, j] = pd.to_numeric(df[feature], errors='coerce').to_numpy(dtype=np.float64)
+
+        # Blank or unknown categories make the row invalid (NaN), like a blank vital
+        rows = np.arange(n)
+        bad_rows = np.zeros(n, dtype=bool)
+        for feature in CATEGORICAL_FEATURES:
+            # Vectorized normalize_level
+            values = df[feature].astype(str).str.strip()
+            codes = pd.Categorical(values, categories=CATEGORY_LEVELS[feature]).codes
+            bad_rows |= codes < 0
+            cols = self.level_columns[feature][codes]
+            hit = (cols >= 0) & (codes >= 0)
+            X[rows[hit], cols[hit]] = 1.0
+        X[bad_rows] = np.nan
+        return X
+
+    def encode_arrow(self, table, out=None):
+        """Encode a pyarrow Table or RecordBatch (N rows, 2-D result)
+
+        Categorical columns are mapped through their dictionary, so only
+        the few distinct values are looked up in Python; plain string
+        columns are dictionary-encoded first. Null vitals become NaN, and
+        so do rows with a null or unknown category, as in a DataFrame.
+        """
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        missing = [col for col in INPUT_FEATURES if col not in table.column_names]
+        if missing:
+            raise ValueError("Missing required columns: " + ", ".join(missing))
+
+        n = table.num_rows
+        X = out if out is not None else np.empty((n, len(self.columns)), dtype=np.float64)
+        X.fill(0.0)
+        for feature, j in zip(NUMERIC_FEATURES, self.numeric_index):
+            try:
+                X[:, j] = pc.cast(table.column(feature), pa.float64()).to_numpy()
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+                raise ValueError(f"{feature} must be numeric, got {table.column(feature).type}") from None
+
+        rows = np.arange(n)
+        bad_rows = np.zeros(n, dtype=bool)
+        for feature in CATEGORICAL_FEATURES:
+            column = table.column(feature)
+            if isinstance(column, pa.ChunkedArray):
+                column = column.combine_chunks()
+            if not pa.types.is_dictionary(column.type):
+                column = pc.dictionary_encode(column)
+            # -2 marks values that are not a known level; a trailing -2 entry stands in for nulls
+            level_cols = np.array(
+                [self.level_index[feature].get(normalize_level(value), -2) for value in column.dictionary.to_pylist()]
+                + [-2],
+                dtype=np.int64,
+            )
+            indices = pc.fill_null(column.indices, len(level_cols) - 1).to_numpy()
+            cols = level_cols[indices]
+            bad_rows |= cols == -2
+            hit = cols >= 0
+            X[rows[hit], cols[hit]] = 1.0
+        X[bad_rows] = np.nan
+        return X
+
+
+class ContributionTable:
+    """Additive per-feature logit terms relative to the scaler's mean patient
+
+    The logistic regression logit is intercept_ + sum(coef * (x - mean) / scale),
+    so each numeric feature contributes weight * (x - mean) and each categorical
+    feature contributes a constant per level. Scoring and explaining a record
+    is a handful of dict lookups and adds.
+    """
+
+    def __init__(self, params, expected_columns):
+        mean = params.mean
+        weight = params.coef / params.scale
+        index = {col: j for j, col in enumerate(expected_columns)}
+
+        self.intercept = params.intercept
+        self.numeric = {
+            feature: (float(weight[index[feature]]), float(mean[index[feature]]))
+            for feature in NUMERIC_FEATURES
+        }
+        self.levels = {}
+        for feature, levels in CATEGORY_LEVELS.items():
+            cols = [index[f"{feature}_{level}"] for level in levels if f"{feature}_{level}" in index]
+            base = -sum(weight[j] * mean[j] for j in cols)
+            self.levels[feature] = {
+                level: float(base + (weight[index[f"{feature}_{level}"]] if f"{feature}_{level}" in index else 0.0))
+                for level in levels
+            }
+
+    def explain(self, record):
+        """Logit contribution of each input feature, in INPUT_FEATURES order"""
+        contributions = {}
+        for feature, (weight, mean) in self.numeric.items():
+            contributions[feature] = weight * (record[feature] - mean)
+        for feature, table in self.levels.items():
+            try:
+                contributions[feature] = table[normalize_level(record[feature])]
+            except KeyError:
+                raise ValueError(
+                    f"Unknown {feature} value {record[feature]!r}; expected one of {CATEGORY_LEVELS[feature]}"
+                ) from None
+        return contributions
+
+    def risk_score(self, record):
+        logit = self.intercept + sum(self.explain(record).values())
+        if logit >= 0:
+            proba = 1.0 / (1.0 + math.exp(-logit))
+        else:
+            proba = math.exp(logit) / (1.0 + math.exp(logit))
+        return round(proba * 100, 1)
+
+
+class HeartModel:
+    """Loaded artifacts plus the fast predictor and encoder built from them"""
+
+    def __init__(self, params, expected_columns, version="unversioned", source_digest=None):
+        self.params = params
+        self.expected_columns = list(expected_columns)
+        self.version = version
+        # For a bundle: pickle_digest() of the pickles it was exported from, if recorded
+        self.source_digest = source_digest
+        if len(params.coef) != len(self.expected_columns):
+            raise ValueError(
+                f"Model has {len(params.coef)} coefficients but {len(self.expected_columns)} expected columns"
+            )
+        self.predictor = FusedPredictor(params)
+        self.encoder = FeatureEncoder(self.expected_columns)
+        self.contributions = ContributionTable(params, self.expected_columns)
+
+    def score(self, record, timer=None):
+        """Score one raw input dict, returns (prediction, risk_score)
+
+        Pass a StageTimer to record the encode and predict stages.
+        """
+        if timer is None:
+            features = self.encoder.encode(record)
+            prediction = int(self.predictor.predict(features))
+            risk_score = round(float(self.predictor.predict_proba(features)) * 100, 1)
+            return prediction, risk_score
+
+        with timer.stage('encode'):
+            features = self.encoder.encode(record)
+        with timer.stage('predict'):
+            prediction = int(self.predictor.predict(features))
+            risk_score = round(float(self.predictor.predict_proba(features)) * 100, 1)
+        return prediction, risk_score
+
+    def score_rows(self, X):
+        """Score an already encoded matrix, returns a list of (prediction, risk_score)"""
+        predictions = self.predictor.predict(X).tolist()
+        probas = self.predictor.predict_proba(X).tolist()
+        return [(int(p), round(proba * 100, 1)) for p, proba in zip(predictions, probas)]
+
+    def sweep(self, record, grid):
+        """Risk scores (%) of record with one or two numeric features varied over a grid
+
+        grid maps each varied feature to its values, in order. Every grid
+        point is encoded into one matrix and scored as a single batch; the
+        result has one axis per varied feature.
+        """
+        if not 1 <= len(grid) <= 2:
+            raise ValueError("A sweep varies one or two features")
+        index = dict(zip(NUMERIC_FEATURES, self.encoder.numeric_index))
+        axes = [np.asarray(values, dtype=np.float64) for values in grid.values()]
+        shape = tuple(len(values) for values in axes)
+
+        X = np.empty((math.prod(shape), len(self.expected_columns)), dtype=np.float64)
+        X[:] = self.encoder.encode(record)
+        for feature, values in zip(grid, np.meshgrid(*axes, indexing='ij')):
+            if feature not in SWEEP_RANGES:
+                raise ValueError(f"Cannot sweep {feature!r}; expected one of {list(SWEEP_RANGES)}")
+            X[:, index[feature]] = values.ravel()
+        return (self.predictor.predict_proba(X) * 100).reshape(shape)
+
+    def _score_matrix(self, X):
+        """Score an encoded batch whose invalid rows hold NaN
+
+        Returns (risk_score, prediction, category code) arrays; invalid rows
+        get a NaN score, prediction -1 and code 0 ("Invalid Input").
+        """
+        bad_rows = np.isnan(X).any(axis=1)
+        X[bad_rows] = 0.0
+
+        proba = self.predictor.predict_proba(X)
+        risk_score = np.round(proba * 100, 1)
+        risk_score[bad_rows] = np.nan
+        prediction = np.where(bad_rows, -1, self.predictor.predict(X))
+        codes = np.select(
+            [bad_rows, risk_score < MODERATE_RISK_THRESHOLD, risk_score < HIGH_RISK_THRESHOLD],
+            [0, 1, 2],
+            default=3
+        ).astype(np.int8)
+        return risk_score, prediction, codes
+
+    def score_frame(self, df, out=None):
+        """Add risk_score, prediction and risk_category columns to a raw input DataFrame
+
+        Rows with missing or non-numeric vitals, or blank or unknown
+        categories, get risk_category "Invalid Input".
+        """
+        X = self.encoder.encode(df, out=out)
+        risk_score, prediction, codes = self._score_matrix(X)
+
+        df['risk_score'] = risk_score
+        df['model_version'] = self.version
+        df['prediction'] = prediction
+        df['risk_category'] = RISK_CATEGORY_LABELS[codes]
+        return df
+
+    def score_arrow(self, table, out=None):
+        """risk_score, prediction, risk_category and model_version columns for a pyarrow Table
+
+        Same results as score_frame; the two string columns come back
+        dictionary-encoded.
+        """
+        import pyarrow as pa
+
+        X = self.encoder.encode_arrow(table, out=out)
+        risk_score, prediction, codes = self._score_matrix(X)
+        return pa.table({
+            'risk_score': pa.array(risk_score, mask=np.isnan(risk_score)),
+            'prediction': pa.array(prediction.astype(np.int8)),
+            'risk_category': pa.DictionaryArray.from_arrays(codes, RISK_CATEGORY_LABELS.tolist()),
+            'model_version': pa.DictionaryArray.from_arrays(np.zeros(len(codes), dtype=np.int8), [self.version]),
+        })
+
+
+def load_artifacts(model_dir=MODEL_DIR, timer=None):
+    """Load the model from model_dir, preferring the bundle over the pickles
+
+    A bundle exported from other pickles than the ones next to it is stale
+    (the pickles were replaced without re-running export_bundle.py): the
+    pickles are loaded instead, with a warning. Pass a StageTimer to record
+    each load step.
+    """
+    timer = timer or StageTimer()
+    bundle_path = os.path.join(model_dir, BUNDLE_FILE)
+    if os.path.exists(bundle_path):
+        with timer.stage('load_bundle'):
+            bundle = load_bundle(bundle_path)
+        if bundle.source_digest is None:
+            return bundle
+        with timer.stage('check_bundle'):
+            digest = pickle_digest(model_dir)
+        if digest is None or digest == bundle.source_digest:
+            return bundle
+        logger.warning(
+            "%s was exported from other pickles than those in %s; loading the pickles. "
+            "Run export_bundle.py to rebuild it.", BUNDLE_FILE, model_dir
+        )
+    return load_pickles(model_dir, timer)
+
+
+def _read_pickles(model_dir):
+    """Bytes of the pickled model, scaler and column list"""
+    blobs = []
+    for name in (MODEL_FILE, SCALER_FILE, COLUMNS_FILE):
+        with open(os.path.join(model_dir, name), 'rb') as f:
+            blobs.append(f.read())
+    return blobs
+
+
+def _blobs_digest(blobs):
+    digest = hashlib.sha256()
+    for blob in blobs:
+        digest.update(blob)
+    return digest.hexdigest()
+
+
+def pickle_digest(model_dir=MODEL_DIR):
+    """sha256 of the pickled model, scaler and column list, or None if any is missing"""
+    try:
+        return _blobs_digest(_read_pickles(model_dir))
+    except FileNotFoundError:
+        return None
+
+
+def load_pickles(model_dir=MODEL_DIR, timer=None):
+    """Load the pickled model, scaler and column list from model_dir
+
+    joblib (and sklearn, which unpickling pulls in) is imported here rather
+    than at module import.
+    """
+    timer = timer or StageTimer()
+    # Read once: the same bytes are unpickled and hashed for the version
+    with timer.stage('read_pickles'):
+        model_blob, scaler_blob, columns_blob = blobs = _read_pickles(model_dir)
+    with timer.stage('import_joblib'):
+        import joblib
+    with timer.stage('load_model'):
+        model = joblib.load(io.BytesIO(model_blob))
+    with timer.stage('load_scaler'):
+        scaler = joblib.load(io.BytesIO(scaler_blob))
+    with timer.stage('load_columns'):
+        expected_columns = joblib.load(io.BytesIO(columns_blob))
+    with timer.stage('build_model'):
+        return HeartModel(
+            LinearParams.from_sklearn(model, scaler), expected_columns,
+            version="pkl-" + _blobs_digest(blobs)[:12]
+        )
+
+# ------------------------ MODEL REGISTRY ------------------------ #
+class ModelRegistry:
+    """Keeps the current HeartModel and hot-swaps it when the artifacts change
+
+    A watcher thread polls the bundle and the pickles every poll_interval
+    seconds; which of them is loaded is up to load_artifacts(), so a
+    replaced pickle takes over from a bundle exported from the old one. A
+    changed file is loaded and validated in the background and only then
+    swapped in with a single reference assignment. Callers read
+    `registry.current` once per request and keep using that object, so
+    in-flight predictions finish on the version they started with. A
+    failed reload keeps the old model and is reported in `last_error`.
+    """
+
+    def __init__(self, model_dir=MODEL_DIR, poll_interval=2.0, timer=None):
+        self.model_dir = model_dir
+        self.poll_interval = poll_interval
+        self.reloads = 0
+        self.last_error = None
+        self._reload_lock = threading.Lock()
+        self._signature = self._artifact_signature()
+        self.current = load_artifacts(model_dir, timer)
+        self._stop = threading.Event()
+        self._thread = None
+        if poll_interval:
+            self._thread = threading.Thread(target=self._watch, name="heart-model-watch", daemon=True)
+            self._thread.start()
+
+    def _artifact_signature(self):
+        signature = []
+        for name in (BUNDLE_FILE, MODEL_FILE, SCALER_FILE, COLUMNS_FILE):
+            try:
+                stat = os.stat(os.path.join(self.model_dir, name))
+                signature.append((name, stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                signature.append((name, None, None))
+        return tuple(signature)
+
+    def check(self):
+        """Reload if the artifact files changed since the last look, returns True on a swap"""
+        signature = self._artifact_signature()
+        if signature == self._signature:
+            return False
+        self._signature = signature
+        return self.reload()
+
+    def reload(self):
+        with self._reload_lock:
+            try:
+                candidate = load_artifacts(self.model_dir)
+                self._validate(candidate)
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                logger.warning("Model reload failed, keeping %s: %s", self.current.version, self.last_error)
+                return False
+            previous, self.current = self.current, candidate
+            self.reloads += 1
+            self.last_error = None
+            logger.info("Model %s replaced by %s", previous.version, candidate.version)
+            return True
+
+    def _validate(self, candidate):
+        if candidate.expected_columns != self.current.expected_columns:
+            raise ValueError("Expected columns changed; restart the service to change the feature layout")
+        _, risk_score = candidate.score(DEFAULT_RECORD)
+        if not math.isfinite(risk_score):
+            raise ValueError("Model produced a non-finite risk score")
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.check()
+            except Exception:
+                logger.exception("Model watcher failed")
+
+    def close(self):
+        self._stop.set()
+
+# ------------------------ MODEL BUNDLE ------------------------ #
+# Layout: BUNDLE_MAGIC, uint32 little-endian header length, JSON header,
+# zero padding to 8 bytes, then the little-endian float64 arrays listed in
+# header["arrays"]. header["sha256"] covers the header (without that key,
+# canonical JSON) followed by the array payload. The optional
+# header["source_sha256"] is the pickle_digest() it was exported from.
+BUNDLE_MAGIC = b"HRTBNDL\x00"
+BUNDLE_FORMAT_VERSION = 1
+BUNDLE_ARRAYS = ('coef', 'mean', 'scale')
+
+
+class BundleError(ValueError):
+    """Raised for bundles that are corrupted or do not match this code"""
+
+
+def _bundle_digest(header, payload):
+    digest = hashlib.sha256()
+    digest.update(json.dumps(header, sort_keys=True, separators=(',', ':')).encode('utf-8'))
+    digest.update(payload)
+    return digest.hexdigest()
+
+
+def write_bundle(heart_model, path, version=None, source_digest=None):
+    """Write heart_model as a single sklearn-free, pickle-free bundle file
+
+    source_digest is the pickle_digest() of the pickles it was exported
+    from; load_artifacts() uses it to notice when they have been replaced.
+    """
+    params = heart_model.params
+    arrays, offset, payload = {}, 0, bytearray()
+    for name in BUNDLE_ARRAYS:
+        data = np.ascontiguousarray(getattr(params, name), dtype='<f8').tobytes()
+        arrays[name] = {'offset': offset, 'length': len(data) // 8}
+        payload += data
+        offset += len(data)
+
+    header = {
+        'format_version': BUNDLE_FORMAT_VERSION,
+        'expected_columns': heart_model.expected_columns,
+        'category_levels': CATEGORY_LEVELS,
+        'intercept': params.intercept,
+        'classes': [int(c) for c in params.classes],
+        'arrays': arrays,
+    }
+    if source_digest is not None:
+        header['source_sha256'] = source_digest
+    header['model_version'] = version or "bundle-" + _bundle_digest(header, bytes(payload))[:12]
+    header['sha256'] = _bundle_digest(header, bytes(payload))
+
+    header_bytes = json.dumps(header, sort_keys=True).encode('utf-8')
+    prefix = BUNDLE_MAGIC + struct.pack('<I', len(header_bytes)) + header_bytes
+    padding = b"\x00" * (-len(prefix) % 8)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(prefix + padding + bytes(payload))
+    os.replace(tmp_path, path)
+    return header['model_version']
+
+
+def load_bundle(path):
+    """Memory-map and validate a bundle written by write_bundle()"""
+    with open(path, 'rb') as f:
+        try:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            raise BundleError(f"{path} is empty") from None
+
+    fixed = len(BUNDLE_MAGIC) + 4
+    if len(buf) < fixed or buf[:len(BUNDLE_MAGIC)] != BUNDLE_MAGIC:
+        raise BundleError(f"{path} is not a heart model bundle")
+    (header_len,) = struct.unpack_from('<I', buf, len(BUNDLE_MAGIC))
+    try:
+        header = json.loads(bytes(buf[fixed:fixed + header_len]).decode('utf-8'))
+    except ValueError:
+        raise BundleError(f"{path} has a corrupted header") from None
+    if header.get('format_version') != BUNDLE_FORMAT_VERSION:
+        raise BundleError(f"{path} has unsupported format version {header.get('format_version')!r}")
+
+    start = fixed + header_len
+    start += -start % 8
+    payload = memoryview(buf)[start:]
+    expected_sha = header.pop('sha256', None)
+    if expected_sha != _bundle_digest(header, payload):
+        raise BundleError(f"{path} failed its checksum")
+    if header.get('category_levels') != CATEGORY_LEVELS:
+        raise BundleError(f"{path} was built for different category levels")
+
+    try:
+        arrays = {
+            name: np.frombuffer(
+                payload, dtype='<f8',
+                count=header['arrays'][name]['length'], offset=header['arrays'][name]['offset']
+            )
+            for name in BUNDLE_ARRAYS
+        }
+        params = LinearParams(
+            coef=arrays['coef'], intercept=header['intercept'],
+            mean=arrays['mean'], scale=arrays['scale'], classes=header['classes']
+        )
+        return HeartModel(
+            params, header['expected_columns'], version=header['model_version'],
+            source_digest=header.get('source_sha256')
+        )
+    except (KeyError, TypeError, ValueError) as e:
+        raise BundleError(f"{path} does not match this code: {str(e)}") from None
+
+# ------------------------ MICRO-BATCHING ------------------------ #
+class MicroBatcher:
+    """Coalesces concurrent single-record requests on an asyncio loop into one scoring call
+
+    Requests submitted in the same loop iteration are scored together in a
+    callback on the loop itself. With max_wait_ms > 0 the batch is held open
+    for that long (or until max_batch requests arrive) to collect more.
+    The default of 0 adds no wait, so a lone request is not slowed down.
+    """
+
+    def __init__(self, get_model, max_batch=64, max_wait_ms=0.0):
+        self.get_model = get_model
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.requests = 0
+        self.batches = 0
+        self._buffer = np.zeros((max_batch, len(get_model().expected_columns)), dtype=np.float64)
+        self._pending = []
+        self._flush_handle = None
+
+    def stats(self):
+        return {
+            'requests': self.requests,
+            'batches': self.batches,
+            'mean_batch_size': self.requests / self.batches if self.batches else 0.0,
+        }
+
+    def submit(self, record, loop):
+        """Queue one raw input dict, returns an asyncio Future of (prediction, risk_score, model_version)"""
+        future = loop.create_future()
+        self._pending.append((record, future))
+        if len(self._pending) >= self.max_batch:
+            self.flush()
+        elif self._flush_handle is None:
+            if self.max_wait > 0:
+                self._flush_handle = loop.call_later(self.max_wait, self.flush)
+            else:
+                self._flush_handle = loop.call_soon(self.flush)
+        return future
+
+    def flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        pending, self._pending = self._pending, []
+        for start in range(0, len(pending), self.max_batch):
+            batch = pending[start:start + self.max_batch]
+            results = self.score_batch([record for record, _ in batch])
+            for (_, future), result in zip(batch, results):
+                if future.cancelled():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+    def score_batch(self, records):
+        """Score up to max_batch raw input dicts in one predictor call
+
+        The whole batch uses the model current when it starts. Returns one
+        (prediction, risk_score, model_version) tuple per record, or the
+        exception raised while encoding that record.
+        """
+        heart_model = self.get_model()
+        results = [None] * len(records)
+        rows = []
+        for i, record in enumerate(records):
+            try:
+                heart_model.encoder.encode(record, out=self._buffer[len(rows)])
+            except Exception as e:
+                results[i] = e
+                continue
+            rows.append(i)
+        if rows:
+            for i, result in zip(rows, heart_model.score_rows(self._buffer[:len(rows)])):
+                results[i] = result + (heart_model.version,)
+            self.requests += len(rows)
+            self.batches += 1
+        return results
+
+# ------------------------ VALIDATION FUNCTIONS ------------------------ #
+def record_error(record):
+    """Reason a raw input record (e.g. parsed JSON) cannot be scored, or None
+
+    The one check used by the HTTP service and score_records.py.
+    """
+    if not isinstance(record, dict):
+        return "Each record must be a JSON object"
+    missing = [f for f in INPUT_FEATURES if f not in record]
+    if missing:
+        return "Missing required fields: " + ", ".join(missing)
+    for f in NUMERIC_FEATURES:
+        value = record[f]
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+            return f"{f} must be a number"
+    for f in CATEGORICAL_FEATURES:
+        if not isinstance(record[f], str):
+            return f"{f} must be a string"
+        if normalize_level(record[f]) not in CATEGORY_LEVELS[f]:
+            return f"Unknown {f} value {record[f]!r}; expected one of {CATEGORY_LEVELS[f]}"
+    return None
+
+
+def validate_inputs(age, bp, chol, hr):
+    """Validate user inputs and show warnings if needed"""
+    warnings = []
+    
+    if bp < 90 or bp > 180:
+        warnings.append("⚠️ Blood pressure seems unusual. Please verify your reading.")
+    
+    if chol > 300:
+        warnings.append("⚠️ Very high cholesterol detected. Please consult a doctor.")
+    
+    if hr < 50:
+        warnings.append("⚠️ Low heart rate detected. This may need medical attention.")
+    elif hr > 200:
+        warnings.append("⚠️ Extremely high heart rate. Please verify.")
+    
+    return warnings
+
+# ------------------------ HELPER: RISK CATEGORY ------------------------ #
+def get_risk_category(risk_score, prediction):
+    """Returns (label, class_name, emoji)"""
+    if risk_score is not None:
+        if risk_score < MODERATE_RISK_THRESHOLD:
+            return "Low Risk", "low", "🟢"
+        elif risk_score < HIGH_RISK_THRESHOLD:
+            return "Moderate Risk", "moderate", "🟡"
+        else:
+            return "High Risk", "high", "🔴"
+    else:
+        if prediction == 1:
+            return "High Risk", "high", "🔴"
+        else:
+            return "Low Risk", "low", "🟢"
+
+# ------------------------ HELPER: HEALTH LEVELS ------------------------ #
+def _level_and_emoji(value, low_thr, high_thr):
+    if value < low_thr:
+        return "Good", "🟢"
+    elif value < high_thr:
+        return "Borderline", "🟡"
+    else:
+        return "High", "🔴"
+
+
+def get_health_levels(resting_bp, cholesterol, max_hr, fasting_bs):
+    """Returns {'bp'|'chol'|'hr'|'sugar': (level, emoji)}"""
+    if max_hr >= 150:
+        hr = "Good", "🟢"
+    elif max_hr >= 120:
+        hr = "Average", "🟡"
+    else:
+        hr = "Low Capacity", "🔴"
+    return {
+        'bp': _level_and_emoji(resting_bp, 120, 140),
+        'chol': _level_and_emoji(cholesterol, 200, 240),
+        'hr': hr,
+        'sugar': ("Normal", "🟢") if fasting_bs == 0 else ("High", "🔴"),
+    }
+
+# ------------------------ BATCH SCORING ------------------------ #
+def score_csv(source, out_file, heart_model, chunk_rows=BATCH_CHUNK_ROWS, on_chunk=None):
+    """Score a CSV chunk by chunk and stream results into out_file, returns the row count
+
+    on_chunk, if given, is called with each scored chunk (e.g. CohortAggregator.add).
+    """
+    total = 0
+    buffer = np.empty((chunk_rows, len(heart_model.expected_columns)), dtype=np.float64)
+    for i, chunk in enumerate(pd.read_csv(source, chunksize=chunk_rows)):
+        try:
+            heart_model.score_frame(chunk, out=buffer[:len(chunk)])
+        except ValueError as e:
+            raise ValueError(f"rows {total + 1}-{total + len(chunk)}: {str(e)}") from None
+        if on_chunk is not None:
+            on_chunk(chunk)
+        chunk.to_csv(out_file, header=(i == 0), index=False)
+        total += len(chunk)
+    return total
+
+
+def score_parquet(source, out_file, heart_model, on_chunk=None):
+    """Score a Parquet file row group by row group into a Parquet out_file, returns the row count
+
+    Categorical columns are read dictionary-encoded and nothing is
+    converted row by row. The output keeps the input columns and adds
+    risk_score, prediction, risk_category and model_version. on_chunk,
+    if given, is called with each scored row group (a pyarrow Table).
+    """
+    import pyarrow.parquet as pq
+
+    parquet = pq.ParquetFile(source, read_dictionary=CATEGORICAL_FEATURES)
+    metadata = parquet.metadata
+    max_rows = max((metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)), default=0)
+    if not max_rows:
+        raise ValueError("Parquet file has no rows")
+    buffer = np.empty((max_rows, len(heart_model.expected_columns)), dtype=np.float64)
+
+    total = 0
+    writer = None
+    try:
+        for i in range(metadata.num_row_groups):
+            table = parquet.read_row_group(i)
+            n = table.num_rows
+            try:
+                results = heart_model.score_arrow(table, out=buffer[:n])
+            except ValueError as e:
+                raise ValueError(f"rows {total + 1}-{total + n}: {str(e)}") from None
+            table = table.drop_columns([name for name in results.column_names if name in table.column_names])
+            for name in results.column_names:
+                table = table.append_column(name, results.column(name))
+            if on_chunk is not None:
+                on_chunk(table)
+            if writer is None:
+                writer = pq.ParquetWriter(out_file, table.schema)
+            writer.write_table(table)
+            total += n
+    finally:
+        if writer is not None:
+            writer.close()
+    return total
+
+# ------------------------ COHORT AGGREGATES ------------------------ #
+# Risk histogram bins (%), the features risk is broken down by, and the
+# most points the age-vs-risk scatter gets, whatever the batch size
+COHORT_RISK_BINS = np.linspace(0, 100, 51)
+COHORT_GROUP_FEATURES = ['ChestPainType', 'ST_Slope']
+COHORT_SAMPLE_POINTS = 5000
+COHORT_COLUMNS = ['Age', *COHORT_GROUP_FEATURES, 'risk_score']
+
+
+class CohortAggregator:
+    """Running aggregates of scored batch chunks for the cohort dashboard
+
+    Memory and summary() size stay constant however many rows are added:
+    a risk histogram, the count and mean risk per level of each
+    COHORT_GROUP_FEATURES feature, and a uniform sample of at most
+    `sample_points` (age, risk) pairs, kept as the rows with the smallest
+    random keys (bottom-k sampling, so chunks merge without bias).
+    """
+
+    def __init__(self, sample_points=COHORT_SAMPLE_POINTS, seed=0):
+        self.sample_points = sample_points
+        self.rows = 0
+        self.invalid = 0
+        self.risk_counts = np.zeros(len(COHORT_RISK_BINS) - 1, dtype=np.int64)
+        self.group_counts = {f: np.zeros(len(CATEGORY_LEVELS[f]), dtype=np.int64) for f in COHORT_GROUP_FEATURES}
+        self.group_sums = {f: np.zeros(len(CATEGORY_LEVELS[f]), dtype=np.float64) for f in COHORT_GROUP_FEATURES}
+        self._rng = np.random.default_rng(seed)
+        self._sample_keys = np.empty(0)
+        self._sample_age = np.empty(0, dtype=np.float32)
+        self._sample_risk = np.empty(0, dtype=np.float32)
+
+    def add(self, chunk):
+        """Add a score_frame() DataFrame or score_parquet() Table"""
+        if not isinstance(chunk, pd.DataFrame):
+            chunk = chunk.select(COHORT_COLUMNS).to_pandas()
+        risk = chunk['risk_score'].to_numpy(dtype=np.float64, na_value=np.nan)
+        valid = ~np.isnan(risk)
+        self.rows += len(risk)
+        self.invalid += int((~valid).sum())
+        risk = risk[valid]
+
+        # np.histogram leaves 100.0 in the last bin, as wanted
+        self.risk_counts += np.histogram(risk, bins=COHORT_RISK_BINS)[0]
+        for feature in COHORT_GROUP_FEATURES:
+            levels = CATEGORY_LEVELS[feature]
+            # Normalized as FeatureEncoder does, so " ASY" counts as ASY
+            values = chunk[feature].astype(str).str.strip().to_numpy()[valid]
+            codes = pd.Categorical(values, categories=levels).codes
+            known = codes >= 0
+            self.group_counts[feature] += np.bincount(codes[known], minlength=len(levels))
+            self.group_sums[feature] += np.bincount(codes[known], weights=risk[known], minlength=len(levels))
+
+        keys = np.concatenate([self._sample_keys, self._rng.random(len(risk))])
+        ages = pd.to_numeric(chunk['Age'], errors='coerce').to_numpy(dtype=np.float32, na_value=np.nan)
+        age = np.concatenate([self._sample_age, ages[valid]])
+        risk = np.concatenate([self._sample_risk, risk.astype(np.float32)])
+        if len(keys) > self.sample_points:
+            keep = np.argpartition(keys, self.sample_points)[:self.sample_points]
+            keys, age, risk = keys[keep], age[keep], risk[keep]
+        self._sample_keys, self._sample_age, self._sample_risk = keys, age, risk
+
+    def summary(self):
+        """Plain dict of the aggregates; 'nbytes' is the size of its arrays"""
+        groups = {}
+        for feature in COHORT_GROUP_FEATURES:
+            counts = self.group_counts[feature]
+            with np.errstate(invalid='ignore', divide='ignore'):
+                mean_risk = np.where(counts > 0, self.group_sums[feature] / counts, np.nan)
+            groups[feature] = {'levels': CATEGORY_LEVELS[feature], 'counts': counts.copy(), 'mean_risk': mean_risk}
+        summary = {
+            'rows': self.rows,
+            'invalid': self.invalid,
+            'risk_bins': COHORT_RISK_BINS,
+            'risk_counts': self.risk_counts.copy(),
+            'groups': groups,
+            'sample_age': self._sample_age.copy(),
+            'sample_risk': self._sample_risk.copy(),
+        }
+        summary['nbytes'] = (
+            COHORT_RISK_BINS.nbytes + self.risk_counts.nbytes + self._sample_age.nbytes + self._sample_risk.nbytes
+            + sum(group['counts'].nbytes + group['mean_risk'].nbytes for group in groups.values())
+        )
+        return summary
+
+# ------------------------ REFERENCE POPULATION ------------------------ #
+class ReferenceIndex:
+    """Sorted risk scores (%) of a reference cohort under one model version"""
+
+    def __init__(self, scores, model_version):
+        scores = np.asarray(scores, dtype=np.float64)
+        self.scores = np.sort(scores[np.isfinite(scores)])
+        self.model_version = model_version
+        if not len(self.scores):
+            raise ValueError("Reference cohort has no valid rows")
+
+    @classmethod
+    def from_csv(cls, model, path, chunk_rows=BATCH_CHUNK_ROWS):
+        """Score a cohort CSV chunk by chunk; rows with invalid vitals are left out"""
+        parts = []
+        buffer = np.empty((chunk_rows, len(model.expected_columns)), dtype=np.float64)
+        for chunk in pd.read_csv(path, chunksize=chunk_rows, usecols=INPUT_FEATURES):
+            parts.append(model.score_frame(chunk, out=buffer[:len(chunk)])['risk_score'].to_numpy())
+        return cls(np.concatenate(parts) if parts else [], model.version)
+
+    def __len__(self):
+        return len(self.scores)
+
+    def percentile(self, risk_score):
+        """Percent of the cohort with a strictly lower risk score, by binary search"""
+        return 100.0 * int(np.searchsorted(self.scores, risk_score, side='left')) / len(self.scores)
+
+
+class ReferencePopulation:
+    """ReferenceIndex for whichever model is passed in, rebuilt when the model or the cohort file changes
+
+    Builds happen on the first lookup after a change (one scoring pass over
+    the cohort); every other lookup is a stat of the cohort file plus a
+    binary search. Without a cohort file, or when it cannot be scored,
+    lookups return None and the reason is kept in `last_error`.
+    """
+
+    def __init__(self, path=REFERENCE_COHORT):
+        self.path = path
+        self.builds = 0
+        self.last_error = None
+        self._built = (None, None)
+        self._lock = threading.Lock()
+
+    def _signature(self, model):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (model.version, stat.st_mtime_ns, stat.st_size)
+
+    def index_for(self, model):
+        signature = self._signature(model)
+        if signature is None:
+            return None
+        built_signature, index = self._built
+        if built_signature == signature:
+            return index
+        with self._lock:
+            built_signature, index = self._built
+            if built_signature != signature:
+                try:
+                    index = ReferenceIndex.from_csv(model, self.path)
+                    self.last_error = None
+                except (OSError, ValueError) as e:
+                    index = None
+                    self.last_error = f"{type(e).__name__}: {e}"
+                    logger.warning("Reference cohort %s not usable: %s", self.path, self.last_error)
+                self._built = (signature, index)
+                self.builds += 1
+            return index
+
+    def percentile(self, model, risk_score):
+        """Percent of the reference cohort scored lower than risk_score by model, or None"""
+        index = self.index_for(model)
+        if index is None or risk_score is None:
+            return None
+        return index.percentile(risk_score)
+
+
+# ------------------------ LIVE SCORING ------------------------ #
+# Input changes closer together than this are coalesced by live scoring
+LIVE_DEBOUNCE_SECONDS = 0.15
+
+
+def score_live(model, record):
+    """Fast path for as-you-type updates: encode, linear score and category only
+
+    Returns (prediction, risk_score, (label, class_name, emoji)).
+    """
+    prediction, risk_score = model.score(record)
+    return prediction, risk_score, get_risk_category(risk_score, prediction)
+
+
+class Debouncer:
+    """Spaces out work triggered by bursts of events
+
+    The first event after a quiet period runs at once. An event within
+    `interval` of the previous run waits out the rest of the interval
+    first, so when the waiting caller can be preempted by the next event
+    (as a Streamlit rerun is), only the last event of a burst does the work.
+    """
+
+    def __init__(self, interval=LIVE_DEBOUNCE_SECONDS):
+        self.interval = interval
+        self._last_run = None
+
+    def wait(self):
+        """Sleep until the interval since the previous run has passed, returns the seconds slept"""
+        delay = 0.0
+        if self._last_run is not None:
+            delay = max(0.0, self.interval - (time.monotonic() - self._last_run))
+            if delay:
+                time.sleep(delay)
+        self._last_run = time.monotonic()
+        return delay
+
+
+# ------------------------ RESULT CACHE ------------------------ #
+def input_key(record, model_version):
+    """Canonical hash of the 11 inputs and the model version
+
+    Numbers compare as floats and levels without surrounding whitespace,
+    so 40 and 40.0, or "M" and " M", share a key.
+    """
+    values = [float(record[f]) for f in NUMERIC_FEATURES] + [str(record[f]).strip() for f in CATEGORICAL_FEATURES]
+    return hashlib.blake2b(json.dumps([model_version, values]).encode(), digest_size=16).hexdigest()
+
+
+class ResultCache:
+    """Process-wide LRU of per-input results, bounded by the total bytes of its entries
+
+    Callers declare each entry's size, and can update it with resize()
+    when an entry grows after it was cached (e.g. a report rendered later).
+    """
+
+    def __init__(self, max_bytes=RESULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Cached value for key, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, nbytes):
+        with self._lock:
+            if key in self._entries:
+                self.total_bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, nbytes)
+            self.total_bytes += nbytes
+            self._evict()
+
+    def resize(self, key, nbytes):
+        """Update the size of a cached entry; a no-op once it has been evicted"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries[key] = (entry[0], nbytes)
+                self.total_bytes += nbytes - entry[1]
+                self._evict()
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes and self._entries:
+            _, (_, nbytes) = self._entries.popitem(last=False)
+            self.total_bytes -= nbytes
+            self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self.total_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+# ------------------------ INSTRUMENTATION ------------------------ #
+class StageTimer:
+    """Wall-clock time per named stage of one request or script run"""
+
+    def __init__(self):
+        self.stages = {}
+
+    def add(self, name, seconds):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def total(self):
+        return sum(self.stages.values())
+
+
+class TimingStats:
+    """Process-wide aggregate of StageTimer results, keeping the last `window` samples per stage"""
+
+    def __init__(self, window=1000):
+        self.window = window
+        self._samples = {}
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def record(self, timer):
+        with self._lock:
+            for name, seconds in timer.stages.items():
+                if name not in self._samples:
+                    self._samples[name] = deque(maxlen=self.window)
+                    self._counts[name] = 0
+                self._samples[name].append(seconds)
+                self._counts[name] += 1
+
+    def summary(self):
+        """Per stage: count, mean/p50/p95/max in milliseconds over the retained window"""
+        with self._lock:
+            snapshot = {name: (self._counts[name], np.array(samples)) for name, samples in self._samples.items()}
+        rows = []
+        for name, (count, samples) in snapshot.items():
+            ms = samples * 1000
+            rows.append({
+                'stage': name,
+                'count': count,
+                'mean_ms': float(ms.mean()),
+                'p50_ms': float(np.percentile(ms, 50)),
+                'p95_ms': float(np.percentile(ms, 95)),
+                'max_ms': float(ms.max()),
+            })
+        return rows
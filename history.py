@@ -0,0 +1,372 @@
+"""Prediction history kept for the "Your Risk Trend" section.
+
+PredictionHistory is the default, per-session store. HistoryStore keeps
+history in SQLite so it survives refreshes and can be shared by replicas
+on the same volume; the app uses it when HEART_HISTORY_DB is set.
+Both expose append(), summary() and trend().
+
+HistoryStore users are unauthenticated ids (app6.py keeps one per browser
+in a cookie): anyone who has an id can read and append to its history.
+"""
+import math
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+HISTORY_CAPACITY = 500
+# Point budget of trend(); longer ranges are downsampled to this many points
+TREND_MAX_POINTS = 300
+
+
+def _to_ns(timestamp):
+    """datetime -> int64 ns, naive datetimes are kept as wall-clock time"""
+    return int(np.datetime64(timestamp, 'ns').astype(np.int64))
+
+
+def lttb(x, y, n_out):
+    """Largest-Triangle-Three-Buckets downsampling, returns the indices to keep
+
+    Keeps the first and last point and, from each of n_out - 2 equal-count
+    buckets in between, the point that forms the largest triangle with the
+    point kept before it and the mean of the next bucket, so peaks and
+    dips survive.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = (x - x[0]).astype(np.float64)
+    y = y.astype(np.float64)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        next_start, next_end = (edges[i + 1], edges[i + 2]) if i + 2 < len(edges) else (n - 1, n)
+        cx, cy = x[next_start:next_end].mean(), y[next_start:next_end].mean()
+        area = np.abs((x[a] - cx) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (cy - y[a]))
+        a = start + int(np.argmax(area))
+        keep[i + 1] = a
+    return keep
+
+
+class PredictionHistory:
+    """Fixed-capacity ring buffer of predictions, oldest entries are evicted first
+
+    Columns are preallocated NumPy arrays (int64 ns timestamps, float32
+    scores, small ints for the rest), so per-session memory is capped at
+    roughly 20 bytes * capacity. Count, mean risk and the last two scores
+    are kept up to date on append instead of being recomputed per rerun.
+    """
+
+    def __init__(self, capacity=HISTORY_CAPACITY):
+        if capacity < 2:
+            raise ValueError("capacity must be at least 2")
+        self.capacity = capacity
+        self.timestamps = np.zeros(capacity, dtype=np.int64)
+        self.risk_scores = np.full(capacity, np.nan, dtype=np.float32)
+        self.predictions = np.zeros(capacity, dtype=np.int8)
+        self.ages = np.zeros(capacity, dtype=np.int16)
+        self.bps = np.zeros(capacity, dtype=np.int16)
+        self.cholesterols = np.zeros(capacity, dtype=np.int16)
+        self.version_codes = np.zeros(capacity, dtype=np.int16)
+        self.versions = []
+        self.total = 0  # every append, including evicted entries
+        self._next = 0
+        self._size = 0
+        self._score_sum = 0.0
+        self._score_count = 0
+
+    def __len__(self):
+        return self._size
+
+    def append(self, timestamp, risk_score, prediction, model_version, age, bp, cholesterol):
+        """Add one prediction; timestamp is a datetime, risk_score may be None"""
+        i = self._next
+        if self._size == self.capacity:
+            self._forget_score(self.risk_scores[i])
+        else:
+            self._size += 1
+
+        if model_version not in self.versions:
+            self.versions.append(model_version)
+        score = np.float32(np.nan if risk_score is None else risk_score)
+        self.timestamps[i] = _to_ns(timestamp)
+        self.risk_scores[i] = score
+        self.predictions[i] = prediction
+        self.ages[i] = age
+        self.bps[i] = bp
+        self.cholesterols[i] = cholesterol
+        self.version_codes[i] = self.versions.index(model_version)
+        if not math.isnan(score):
+            self._score_sum += float(score)
+            self._score_count += 1
+
+        self._next = (i + 1) % self.capacity
+        self.total += 1
+
+    def _forget_score(self, score):
+        if not math.isnan(score):
+            self._score_sum -= float(score)
+            self._score_count -= 1
+
+    def _order(self):
+        """Buffer positions from oldest to newest"""
+        if self._size < self.capacity:
+            return np.arange(self._size)
+        return (np.arange(self.capacity) + self._next) % self.capacity
+
+    def summary(self):
+        return {
+            'total': self.total,
+            'mean_risk': self.mean_risk,
+            'latest_risk': self.latest_risk,
+            'previous_risk': self.previous_risk,
+        }
+
+    def trend(self, since=None, max_points=TREND_MAX_POINTS):
+        """(datetime64 times, scores) oldest first, from `since` on, LTTB-downsampled to max_points"""
+        order = self._order()
+        times = self.timestamps[order]
+        scores = self.risk_scores[order]
+        keep = ~np.isnan(scores)
+        if since is not None:
+            keep &= times >= _to_ns(since)
+        times, scores = times[keep], scores[keep]
+        keep = lttb(times, scores, max_points)
+        return times[keep].astype('datetime64[ns]'), scores[keep]
+
+    def column(self, name):
+        """Chronological copy of one column ('timestamps', 'risk_scores', ...)"""
+        return getattr(self, name)[self._order()]
+
+    # ------------------------ SUMMARY ------------------------ #
+    @property
+    def mean_risk(self):
+        """Mean risk score over retained entries, None when there is none"""
+        if not self._score_count:
+            return None
+        return self._score_sum / self._score_count
+
+    def _recent(self, back):
+        if self._size < back:
+            return None
+        score = self.risk_scores[(self._next - back) % self.capacity]
+        return None if math.isnan(score) else float(score)
+
+    @property
+    def latest_risk(self):
+        return self._recent(1)
+
+    @property
+    def previous_risk(self):
+        return self._recent(2)
+
+
+# ------------------------ SQLITE STORE ------------------------ #
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS predictions (
+    id INTEGER PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    ts INTEGER NOT NULL,
+    risk_score REAL,
+    prediction INTEGER NOT NULL,
+    model_version TEXT,
+    age INTEGER,
+    bp INTEGER,
+    cholesterol INTEGER
+);
+CREATE INDEX IF NOT EXISTS predictions_user_ts ON predictions (user_id, ts, risk_score);
+CREATE INDEX IF NOT EXISTS predictions_ts ON predictions (ts);
+"""
+INSERT = (
+    "INSERT INTO predictions (user_id, ts, risk_score, prediction, model_version, age, bp, cholesterol) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+)
+
+
+class HistoryStore:
+    """Prediction history in SQLite (WAL mode), shared by every session of the process
+
+    append() only queues the row; a writer thread commits queued rows in
+    batches every `flush_interval` seconds or once `max_batch` rows are
+    waiting. Reads merge in rows that are still queued, so a session sees
+    its own prediction on the rerun that made it.
+    Aggregates run in SQL over the (user_id, ts, risk_score) index and
+    never load a user's whole history.
+    """
+
+    def __init__(self, path, flush_interval=0.5, max_batch=1000):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.writes = 0
+        self.last_error = None
+
+        conn = self._connect()
+        conn.executescript(SCHEMA)
+        conn.close()
+        # One shared read connection; reads and commits take _commit_lock so
+        # a row is never counted both from the queue and from the table
+        self._reader = self._connect(check_same_thread=False)
+        self._commit_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._pending = []
+        self._in_flight = []
+        self._wakeup = threading.Event()
+        self._stopped = False
+        self._writer = threading.Thread(target=self._write_loop, name="history-writer", daemon=True)
+        self._writer.start()
+
+    def _connect(self, check_same_thread=True):
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=check_same_thread)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def for_user(self, user_id):
+        return UserHistory(self, user_id)
+
+    # ------------------------ WRITES ------------------------ #
+    def append(self, user_id, timestamp, risk_score, prediction, model_version, age, bp, cholesterol):
+        row = (
+            user_id, _to_ns(timestamp), None if risk_score is None else float(risk_score),
+            int(prediction), model_version, int(age), int(bp), int(cholesterol),
+        )
+        with self._lock:
+            self._pending.append(row)
+            if len(self._pending) >= self.max_batch:
+                self._wakeup.set()
+
+    def _write_loop(self):
+        conn = self._connect()
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self._write_pending(conn)
+            if self._stopped:
+                conn.close()
+                return
+
+    def _write_pending(self, conn):
+        with self._lock:
+            if not self._pending:
+                return
+            self._in_flight, self._pending = self._pending, []
+        with self._commit_lock:
+            try:
+                with conn:
+                    conn.executemany(INSERT, self._in_flight)
+                self.writes += len(self._in_flight)
+            except sqlite3.Error as e:
+                # Put the rows back and retry on the next tick
+                self.last_error = str(e)
+                with self._lock:
+                    self._pending[:0] = self._in_flight
+            self._in_flight = []
+
+    def flush(self):
+        """Block until everything appended so far is committed"""
+        while True:
+            with self._lock:
+                if not self._pending and not self._in_flight:
+                    return
+            self._wakeup.set()
+            time.sleep(0.005)
+
+    def close(self):
+        self._stopped = True
+        self._wakeup.set()
+        self._writer.join()
+        self._reader.close()
+
+    # ------------------------ READS ------------------------ #
+    def _queued(self, user_id, since_ns):
+        """Rows for user_id not yet committed; call with _commit_lock held"""
+        with self._lock:
+            rows = self._in_flight + self._pending
+        return [r for r in rows if r[0] == user_id and r[1] >= since_ns]
+
+    def summary(self, user_id, since=None):
+        since_ns = _to_ns(since) if since is not None else -2**63
+        with self._commit_lock:
+            total, scored, score_sum = self._reader.execute(
+                "SELECT COUNT(*), COUNT(risk_score), TOTAL(risk_score) FROM predictions "
+                "WHERE user_id = ? AND ts >= ?", (user_id, since_ns)
+            ).fetchone()
+            recent = self._reader.execute(
+                "SELECT ts, risk_score FROM predictions WHERE user_id = ? AND ts >= ? "
+                "ORDER BY ts DESC LIMIT 2", (user_id, since_ns)
+            ).fetchall()
+            queued = self._queued(user_id, since_ns)
+
+        queued_scores = [r[2] for r in queued if r[2] is not None]
+        total += len(queued)
+        scored += len(queued_scores)
+        score_sum += sum(queued_scores)
+        recent = sorted(recent + [(r[1], r[2]) for r in queued], reverse=True)
+        return {
+            'total': total,
+            'mean_risk': score_sum / scored if scored else None,
+            'latest_risk': recent[0][1] if recent else None,
+            'previous_risk': recent[1][1] if len(recent) > 1 else None,
+        }
+
+    def trend(self, user_id, since=None, max_points=TREND_MAX_POINTS):
+        """(datetime64 times, scores) oldest first
+
+        Up to max_points raw points; over that the range is split into
+        max_points / 2 equal time buckets and each bucket returns its
+        lowest and highest point (min/max bucketing, done in SQL).
+        """
+        since_ns = _to_ns(since) if since is not None else -2**63
+        with self._commit_lock:
+            first, last, count = self._reader.execute(
+                "SELECT MIN(ts), MAX(ts), COUNT(risk_score) FROM predictions "
+                "WHERE user_id = ? AND ts >= ?", (user_id, since_ns)
+            ).fetchone()
+            if count <= max_points:
+                rows = self._reader.execute(
+                    "SELECT ts, risk_score FROM predictions "
+                    "WHERE user_id = ? AND ts >= ? AND risk_score IS NOT NULL ORDER BY ts",
+                    (user_id, since_ns)
+                ).fetchall()
+            else:
+                # SQLite returns the ts of the row holding a bare MIN()/MAX()
+                width = (last - first) // (max_points // 2) + 1
+                rows = sorted({
+                    row
+                    for fn in ("MIN", "MAX")
+                    for row in self._reader.execute(
+                        f"SELECT ts, {fn}(risk_score) FROM predictions "
+                        "WHERE user_id = ? AND ts >= ? AND risk_score IS NOT NULL GROUP BY (ts - ?) / ?",
+                        (user_id, since_ns, first, width)
+                    )
+                })
+            queued = self._queued(user_id, since_ns)
+
+        rows += sorted((r[1], r[2]) for r in queued if r[2] is not None)
+        times = np.array([r[0] for r in rows], dtype=np.int64)
+        scores = np.array([r[1] for r in rows], dtype=np.float32)
+        # Rows still queued can push the result past the budget
+        keep = lttb(times, scores, max_points)
+        return times[keep].astype('datetime64[ns]'), scores[keep]
+
+
+class UserHistory:
+    """HistoryStore bound to one user/device, with the PredictionHistory interface"""
+
+    def __init__(self, store, user_id):
+        self.store = store
+        self.user_id = user_id
+
+    def append(self, timestamp, risk_score, prediction, model_version, age, bp, cholesterol):
+        self.store.append(self.user_id, timestamp, risk_score, prediction, model_version, age, bp, cholesterol)
+
+    def summary(self, since=None):
+        return self.store.summary(self.user_id, since)
+
+    def trend(self, since=None, max_points=TREND_MAX_POINTS):
+        return self.store.trend(self.user_id, since, max_points)
@@ -0,0 +1,365 @@
+"""PDF/TXT risk reports rendered on demand from pre-built templates.
+
+The static parts of each report (titles, headings, disclaimer, layout)
+are built once per process; a report only fills in the dynamic fields,
+and only when its bytes are first requested.
+"""
+import copy
+import importlib.util
+import multiprocessing
+import os
+import threading
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+
+import pandas as pd
+
+from heart_core import BATCH_CHUNK_ROWS, INPUT_FEATURES, get_health_levels
+
+PDF_AVAILABLE = importlib.util.find_spec("fpdf") is not None
+PDF_FONT = "Helvetica"
+GENERATED_FORMAT = "%Y-%m-%d %H:%M:%S"
+# Stand-in for the timestamp in shared report bytes, matching a GENERATED_FORMAT stamp in length and Helvetica width
+GENERATED_PLACEHOLDER = "0000-00-00 00:00:00"
+
+INPUT_DETAIL_TEMPLATES = [
+    "Age: {Age} years",
+    "Sex: {Sex}",
+    "Resting Blood Pressure: {RestingBP} mm Hg",
+    "Cholesterol: {Cholesterol} mg/dL",
+    "Fasting Blood Sugar: {FastingBSText}",
+    "Max Heart Rate: {MaxHR} bpm",
+    "Oldpeak: {Oldpeak}",
+    "Chest Pain Type: {ChestPainType}",
+    "Resting ECG: {RestingECG}",
+    "Exercise-Induced Angina: {ExerciseAngina}",
+    "ST Slope: {ST_Slope}",
+]
+HEALTH_INDICATOR_TEMPLATES = [
+    "Blood Pressure: {bp} ({RestingBP} mm Hg)",
+    "Cholesterol: {chol} ({Cholesterol} mg/dL)",
+    "Max Heart Rate: {hr} ({MaxHR} bpm)",
+    "Blood Sugar: {sugar}",
+]
+
+TXT_TEMPLATE = "\n".join([
+    "=" * 50,
+    "HEART STROKE RISK REPORT",
+    "=" * 50,
+    "Generated: {generated}",
+    "",
+    "Risk Category: {risk_category}",
+    "Estimated Risk: {risk_score}%",
+    "Model Version: {model_version}",
+    "",
+    "INPUT DETAILS:",
+    "-" * 50,
+    "{input_details}",
+    "",
+    "HEALTH INDICATORS:",
+    "-" * 50,
+    "{health_indicators}",
+    "",
+    "DISCLAIMER:",
+    "-" * 50,
+    "This report is for educational purposes only and is NOT a",
+    "medical diagnosis. Please consult with a qualified healthcare",
+    "professional for proper medical advice and treatment.",
+    "",
+    "If you experience chest pain, shortness of breath, or other",
+    "concerning symptoms, seek emergency medical care immediately.",
+    "=" * 50,
+])
+
+# Rows rendered per process-pool task in export_reports()
+EXPORT_TASK_ROWS = 50
+INTEGER_FEATURES = ['Age', 'RestingBP', 'Cholesterol', 'FastingBS', 'MaxHR']
+
+PDF_DISCLAIMER = (
+    "This report is for educational purposes only and is NOT a medical diagnosis. "
+    "Please consult with a qualified healthcare professional for proper medical "
+    "advice and treatment. If you experience chest pain, shortness of breath, or "
+    "other concerning symptoms, seek emergency medical care immediately."
+)
+
+
+# ------------------------ REPORT FIELDS ------------------------ #
+def report_file_stem(generated):
+    return f"heart_risk_report_{generated.strftime('%Y%m%d_%H%M%S')}"
+
+
+def build_report_fields(record, risk_label, risk_score, health, model_version, generated=None):
+    """Dynamic text of one report
+
+    record is the raw input dict, health the result of heart_core.get_health_levels().
+    """
+    generated = generated or datetime.now()
+    values = dict(record)
+    values['FastingBSText'] = 'Yes (>120)' if record['FastingBS'] == 1 else 'No (<120)'
+    values.update({key: level for key, (level, _) in health.items()})
+    return {
+        'generated': generated.strftime(GENERATED_FORMAT),
+        'risk_category': risk_label,
+        'risk_score': risk_score if risk_score is not None else 'N/A',
+        'model_version': model_version,
+        'input_details': [t.format(**values) for t in INPUT_DETAIL_TEMPLATES],
+        'health_indicators': [t.format(**values) for t in HEALTH_INDICATOR_TEMPLATES],
+    }
+
+
+# ------------------------ TXT ------------------------ #
+def render_txt(fields):
+    return TXT_TEMPLATE.format(
+        generated=fields['generated'],
+        risk_category=fields['risk_category'],
+        risk_score=fields['risk_score'],
+        model_version=fields['model_version'],
+        input_details="\n".join(fields['input_details']),
+        health_indicators="\n".join(fields['health_indicators']),
+    )
+
+
+# ------------------------ PDF ------------------------ #
+_pdf_template = None
+_pdf_template_lock = threading.Lock()
+
+
+def _build_pdf_template():
+    """One-page FPDF with all static content drawn, plus the slots for dynamic lines
+
+    Each slot is (key, x, y, width, height, style, size, rgb, align).
+    """
+    from fpdf import FPDF
+
+    pdf = FPDF()
+    pdf.set_auto_page_break(auto=True, margin=15)
+    pdf.set_left_margin(10)
+    pdf.set_right_margin(10)
+    pdf.add_page()
+    epw = pdf.w - pdf.l_margin - pdf.r_margin
+    slots = []
+
+    def slot(key, height, size, rgb=(0, 0, 0), align='L'):
+        slots.append((key, pdf.l_margin, pdf.get_y(), epw, height, "", size, rgb, align))
+        pdf.set_y(pdf.get_y() + height)
+
+    def heading(text, size=14, rgb=(0, 0, 0)):
+        pdf.set_font(PDF_FONT, "B", size)
+        pdf.set_text_color(*rgb)
+        pdf.cell(0, 8, text, new_x="LMARGIN", new_y="NEXT")
+
+    pdf.set_font(PDF_FONT, "B", 18)
+    pdf.cell(0, 12, "Heart Stroke Risk Report", new_x="LMARGIN", new_y="NEXT", align='C')
+    pdf.ln(6)
+    slot('generated', 5, 10, rgb=(80, 80, 80), align='C')
+    pdf.ln(4)
+
+    heading("Risk Assessment")
+    slot('risk_category', 6, 11)
+    slot('risk_score', 6, 11)
+    slot('model_version', 6, 11)
+    pdf.ln(4)
+
+    heading("Input Details")
+    for i in range(len(INPUT_DETAIL_TEMPLATES)):
+        slot(('input_details', i), 5, 10)
+    pdf.ln(4)
+
+    heading("Health Indicators")
+    for i in range(len(HEALTH_INDICATOR_TEMPLATES)):
+        slot(('health_indicators', i), 5, 10)
+    pdf.ln(6)
+
+    heading("IMPORTANT DISCLAIMER", size=12, rgb=(200, 0, 0))
+    pdf.set_font(PDF_FONT, "", 9)
+    pdf.set_text_color(80, 80, 80)
+    pdf.multi_cell(epw, 5, PDF_DISCLAIMER)
+    return pdf, slots
+
+
+def get_pdf_template():
+    """Build the PDF template on first use; raises if fpdf is missing or broken"""
+    global _pdf_template
+    if _pdf_template is None:
+        with _pdf_template_lock:
+            if _pdf_template is None:
+                _pdf_template = _build_pdf_template()
+    return _pdf_template
+
+
+def _slot_text(fields, key):
+    if key == 'generated':
+        return f"Generated: {fields['generated']}"
+    if key == 'risk_category':
+        return f"Risk Category: {fields['risk_category']}"
+    if key == 'risk_score':
+        return f"Estimated Risk Score: {fields['risk_score']}%"
+    if key == 'model_version':
+        return f"Model Version: {fields['model_version']}"
+    name, i = key
+    return fields[name][i]
+
+
+def render_pdf(fields, compress=True):
+    template, slots = get_pdf_template()
+    pdf = copy.deepcopy(template)
+    pdf.set_compression(compress)
+    for key, x, y, width, height, style, size, rgb, align in slots:
+        pdf.set_font(PDF_FONT, style, size)
+        pdf.set_text_color(*rgb)
+        pdf.set_xy(x, y)
+        text = _slot_text(fields, key).encode("latin-1", "replace").decode("latin-1")
+        pdf.cell(width, height, text, align=align)
+    return bytes(pdf.output())
+
+
+# ------------------------ CACHED REPORT ------------------------ #
+def _stamp(data, generated):
+    stamp = (generated or datetime.now()).strftime(GENERATED_FORMAT)
+    return data.replace(GENERATED_PLACEHOLDER.encode("ascii"), stamp.encode("ascii"), 1)
+
+
+class PredictionReport:
+    """Report for one prediction; each format is rendered at most once, on first request
+
+    Formats are rendered with GENERATED_PLACEHOLDER for the timestamp, so
+    one report can serve every session with the same inputs; each call
+    stamps in its own generated time (default now). The PDF is left
+    uncompressed so the placeholder is plain text in it.
+    on_render, if given, is called after a format is rendered, e.g. so a
+    cache holding the report can account for its new nbytes.
+    """
+
+    def __init__(self, fields, on_render=None):
+        self.fields = dict(fields, generated=GENERATED_PLACEHOLDER)
+        self.on_render = on_render
+        self._pdf = None
+        self._txt = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def pdf_name(generated):
+        return report_file_stem(generated) + ".pdf"
+
+    @staticmethod
+    def txt_name(generated):
+        return report_file_stem(generated) + ".txt"
+
+    @property
+    def nbytes(self):
+        """Size of the formats rendered so far"""
+        return len(self._pdf or b"") + len(self._txt or b"")
+
+    def pdf_bytes(self, generated=None):
+        with self._lock:
+            rendered = self._pdf is None
+            if rendered:
+                self._pdf = render_pdf(self.fields, compress=False)
+        if rendered and self.on_render is not None:
+            self.on_render()
+        return _stamp(self._pdf, generated)
+
+    def txt_bytes(self, generated=None):
+        with self._lock:
+            rendered = self._txt is None
+            if rendered:
+                self._txt = render_txt(self.fields).encode("utf-8")
+        if rendered and self.on_render is not None:
+            self.on_render()
+        return _stamp(self._txt, generated)
+
+
+# ------------------------ BULK EXPORT ------------------------ #
+def report_fields_from_row(row, generated=None):
+    """Report fields for one row of score_frame()/score_csv() output"""
+    record = {f: row[f] for f in INPUT_FEATURES}
+    for f in INTEGER_FEATURES:
+        record[f] = int(record[f])
+    risk_score = row['risk_score']
+    health = get_health_levels(record['RestingBP'], record['Cholesterol'], record['MaxHR'], record['FastingBS'])
+    return build_report_fields(
+        record, row['risk_category'], None if pd.isna(risk_score) else risk_score,
+        health, row['model_version'], generated,
+    )
+
+
+def _render_rows(rows, formats, generated):
+    """Worker task: [(row_number, row)] -> (rows, skipped, [(name, bytes)])"""
+    files, skipped = [], 0
+    for number, row in rows:
+        if row['prediction'] == -1:
+            skipped += 1
+            continue
+        fields = report_fields_from_row(row, generated)
+        stem = f"patient_{number:06d}"
+        if 'pdf' in formats:
+            files.append((stem + ".pdf", render_pdf(fields)))
+        if 'txt' in formats:
+            files.append((stem + ".txt", render_txt(fields).encode("utf-8")))
+    return len(rows), skipped, files
+
+
+def _export_tasks(source, chunk_rows, task_rows):
+    number = 0
+    for chunk in pd.read_csv(source, chunksize=chunk_rows):
+        records = chunk.to_dict('records')
+        for i in range(0, len(records), task_rows):
+            yield [(number + j + 1, row) for j, row in enumerate(records[i:i + task_rows], start=i)]
+        number += len(records)
+
+
+def export_reports(source, out_file, formats=('pdf',), workers=None, progress=None,
+                   chunk_rows=BATCH_CHUNK_ROWS, task_rows=EXPORT_TASK_ROWS):
+    """Render one report per scored row of a CSV into a ZIP archive written to out_file
+
+    Rows are rendered in a process pool and each finished task is written to
+    the archive straight away; at most 2 tasks per worker are in flight, so
+    memory stays bounded whatever the cohort size. Rows that failed
+    validation (prediction -1) get no report.
+    progress(rows_done, reports_written) is called after every task.
+    Returns {'rows', 'reports', 'skipped', 'seconds', 'patients_per_sec'};
+    'reports' counts files, so a PDF+TXT export has two per patient.
+    """
+    formats = [f.lower() for f in formats]
+    unknown = set(formats) - {'pdf', 'txt'}
+    if unknown or not formats:
+        raise ValueError(f"Unsupported report formats: {', '.join(sorted(unknown)) or '(none)'}")
+    if 'pdf' in formats and not PDF_AVAILABLE:
+        raise ValueError("PDF reports need the fpdf2 package")
+
+    workers = workers or os.cpu_count() or 1
+    generated = datetime.now()
+    stats = {'rows': 0, 'reports': 0, 'skipped': 0}
+    start = time.perf_counter()
+
+    def collect(done):
+        for future in done:
+            rows, skipped, files = future.result()
+            for name, data in files:
+                # fpdf already deflates PDF content streams
+                compress = zipfile.ZIP_STORED if name.endswith(".pdf") else zipfile.ZIP_DEFLATED
+                archive.writestr(name, data, compress_type=compress)
+            stats['rows'] += rows
+            stats['skipped'] += skipped
+            stats['reports'] += len(files)
+            if progress is not None:
+                progress(stats['rows'], stats['reports'])
+
+    # spawn, not fork: the callers (Streamlit, uvicorn) are multi-threaded
+    context = multiprocessing.get_context("spawn")
+    with zipfile.ZipFile(out_file, "w") as archive, \
+            ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        pending = set()
+        for task in _export_tasks(source, chunk_rows, task_rows):
+            if len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+            pending.add(pool.submit(_render_rows, task, formats, generated))
+        collect(wait(pending).done)
+
+    stats['seconds'] = time.perf_counter() - start
+    patients = stats['rows'] - stats['skipped']
+    stats['patients_per_sec'] = patients / stats['seconds'] if stats['seconds'] else 0.0
+    return stats
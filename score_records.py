@@ -0,0 +1,191 @@
+"""Stream patient records (JSONL or CSV) through the heart risk model.
+
+    python score_records.py patients.csv > scored.csv
+    cat patients.jsonl | python score_records.py --workers 4 > scored.jsonl
+
+Each output record is the input record plus the fields app6.py and the
+HTTP service report: risk_score, prediction, risk_category, risk_class,
+model_version, warnings (validate_inputs) and error. Records that cannot
+be scored keep their place in the output with risk_category
+"Invalid Input" and the reason in error.
+
+Chunks of --chunk-rows records are parsed, scored and serialized in a
+process pool; output keeps the input order and at most two chunks per
+worker are in flight, so memory stays flat however large the input.
+Throughput is reported on stderr at the end.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+import heart_core
+from heart_core import (
+    BATCH_CHUNK_ROWS, INPUT_FEATURES, NUMERIC_FEATURES,
+    get_risk_category, record_error, validate_inputs,
+)
+
+FORMATS = ('jsonl', 'csv')
+OUTPUT_FIELDS = ['risk_score', 'prediction', 'risk_category', 'risk_class', 'model_version', 'warnings', 'error']
+
+_model = None
+_encode_json = json.JSONEncoder(ensure_ascii=False).encode
+
+
+def _init_worker(model_dir):
+    global _model
+    _model = heart_core.load_artifacts(model_dir)
+
+
+def score_records(model, records, errors=None):
+    """Output fields for each record, in order
+
+    errors optionally holds a reason, found earlier (e.g. while parsing),
+    that a record cannot be scored.
+    """
+    errors = [
+        error if error is not None else record_error(record)
+        for record, error in zip(records, errors or [None] * len(records))
+    ]
+    valid = [record for record, error in zip(records, errors) if error is None]
+    scores = iter(())
+    if valid:
+        df = model.score_frame(pd.DataFrame.from_records(valid, columns=INPUT_FEATURES))
+        scores = zip(df['prediction'].tolist(), df['risk_score'].tolist())
+
+    results = []
+    for record, error in zip(records, errors):
+        if error is not None:
+            results.append({
+                'risk_score': None, 'prediction': -1, 'risk_category': "Invalid Input", 'risk_class': None,
+                'model_version': model.version, 'warnings': [], 'error': error,
+            })
+            continue
+        prediction, risk_score = next(scores)
+        risk_label, risk_class, _ = get_risk_category(risk_score, prediction)
+        results.append({
+            'risk_score': risk_score, 'prediction': prediction, 'risk_category': risk_label,
+            'risk_class': risk_class, 'model_version': model.version,
+            'warnings': validate_inputs(record['Age'], record['RestingBP'], record['Cholesterol'], record['MaxHR']),
+            'error': None,
+        })
+    return results
+
+
+def _score_chunk(fmt, chunk, header, model=None):
+    """Worker task: raw JSONL lines or a CSV DataFrame -> (serialized output, rows, invalid rows)"""
+    model = model or _model
+    if fmt == 'jsonl':
+        records, errors = [], []
+        for line in chunk:
+            try:
+                records.append(json.loads(line))
+                errors.append(None)
+            except ValueError as e:
+                records.append({})
+                errors.append(f"Invalid JSON: {e}")
+        results = score_records(model, records, errors)
+        text = "".join(
+            _encode_json({**record, **result} if isinstance(record, dict) else result) + "\n"
+            for record, result in zip(records, results)
+        )
+        return text, len(records), sum(result['error'] is not None for result in results)
+
+    # Non-numeric vitals become NaN here, which record_error rejects; the output keeps the raw values
+    typed = chunk.copy()
+    for f in NUMERIC_FEATURES:
+        if f in typed.columns:
+            typed[f] = pd.to_numeric(typed[f], errors='coerce')
+    results = pd.DataFrame(score_records(model, typed.to_dict('records')), columns=OUTPUT_FIELDS, index=chunk.index)
+    results['warnings'] = results['warnings'].map("; ".join)
+    out = pd.concat([chunk, results], axis=1)
+    return out.to_csv(header=header, index=False), len(out), int(results['error'].notna().sum())
+
+
+def _chunks(source, fmt, chunk_rows):
+    if fmt == 'csv':
+        yield from pd.read_csv(source, chunksize=chunk_rows)
+        return
+    lines = []
+    for line in source:
+        if line.strip():
+            lines.append(line)
+            if len(lines) == chunk_rows:
+                yield lines
+                lines = []
+    if lines:
+        yield lines
+
+
+def score_stream(source, out, fmt='jsonl', workers=None, chunk_rows=BATCH_CHUNK_ROWS, model_dir=heart_core.MODEL_DIR):
+    """Score every record read from source (a text stream) and write them, in order, to out
+
+    workers=0 scores in this process. Returns {'rows', 'invalid', 'seconds', 'rows_per_sec'}.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported format {fmt!r}; expected one of {FORMATS}")
+    workers = (os.cpu_count() or 1) if workers is None else workers
+    stats = {'rows': 0, 'invalid': 0}
+    start = time.perf_counter()
+
+    def write(result):
+        text, rows, invalid = result
+        out.write(text)
+        stats['rows'] += rows
+        stats['invalid'] += invalid
+
+    if workers == 0:
+        model = heart_core.load_artifacts(model_dir)
+        for i, chunk in enumerate(_chunks(source, fmt, chunk_rows)):
+            write(_score_chunk(fmt, chunk, i == 0, model))
+    else:
+        # spawn, not fork, like reports.export_reports; the model is loaded once per worker
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker, initargs=(model_dir,)) as pool:
+            pending = deque()
+            for i, chunk in enumerate(_chunks(source, fmt, chunk_rows)):
+                if len(pending) >= 2 * workers:
+                    write(pending.popleft().result())
+                pending.append(pool.submit(_score_chunk, fmt, chunk, i == 0))
+            while pending:
+                write(pending.popleft().result())
+
+    stats['seconds'] = time.perf_counter() - start
+    stats['rows_per_sec'] = stats['rows'] / stats['seconds'] if stats['seconds'] else 0.0
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", nargs="?", default="-", help="JSONL or CSV file (default: stdin)")
+    parser.add_argument("--format", choices=FORMATS, help="input and output format (default: from the file extension, jsonl for stdin)")
+    parser.add_argument("--workers", type=int, help="scoring processes, 0 to score in this process (default: CPU count)")
+    parser.add_argument("--chunk-rows", type=int, default=BATCH_CHUNK_ROWS, help="records per task")
+    parser.add_argument("--model-dir", default=heart_core.MODEL_DIR, help="directory with the model artifacts")
+    args = parser.parse_args()
+
+    fmt = args.format
+    if fmt is None:
+        fmt = 'csv' if args.input.lower().endswith(".csv") else 'jsonl'
+    source = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8", newline="")
+    try:
+        stats = score_stream(source, sys.stdout, fmt, args.workers, args.chunk_rows, args.model_dir)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+    sys.stdout.flush()
+    print(
+        f"Scored {stats['rows']:,} records ({stats['invalid']:,} invalid) in {stats['seconds']:.2f}s "
+        f"({stats['rows_per_sec']:,.0f} rows/sec)",
+        file=sys.stderr
+    )
+
+
+if __name__ == "__main__":
+    main()
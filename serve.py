@@ -0,0 +1,39 @@
+"""ASGI entry point for app6.py with long-lived caching of versioned static assets.
+
+    uvicorn serve:app --host 0.0.0.0 --port 8501
+
+Streamlit serves ./static with revalidation headers only. Requests for a
+content-versioned asset (``?v=<hash>``, as app6.py links the theme) get
+``Cache-Control: public, max-age=31536000, immutable`` here, so browsers
+skip even the revalidation round trip until the file's content changes.
+`streamlit run app6.py` keeps working without this module.
+"""
+import streamlit as st
+from starlette.middleware import Middleware
+
+STATIC_PREFIX = "/app/static/"
+IMMUTABLE_CACHE = b"public, max-age=31536000, immutable"
+
+
+class VersionedStaticCache:
+    """Pure ASGI middleware that marks versioned static responses immutable"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if (scope['type'] != 'http' or not scope['path'].startswith(STATIC_PREFIX)
+                or b"v=" not in scope.get('query_string', b"")):
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_cache(message):
+            if message['type'] == 'http.response.start' and message['status'] == 200:
+                headers = [(k, v) for k, v in message.get('headers', []) if k.lower() != b'cache-control']
+                message = dict(message, headers=headers + [(b'cache-control', IMMUTABLE_CACHE)])
+            await send(message)
+
+        await self.app(scope, receive, send_with_cache)
+
+
+app = st.App("app6.py", middleware=[Middleware(VersionedStaticCache)])
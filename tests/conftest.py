@@ -0,0 +1,6 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# The app modules live at the repo root and the benchmark scripts import each other by name
+sys.path[:0] = [ROOT, os.path.join(ROOT, "benchmarks")]
@@ -0,0 +1,57 @@
+"""Live-scoring fast path budget and debouncing"""
+import os
+import random
+import time
+
+import numpy as np
+import pytest
+
+import heart_core
+from heart_core import Debouncer, score_live
+from loadtest import random_record
+
+LIVE_BUDGET_MS = float(os.environ.get("HEART_LIVE_BUDGET_MS", 1.0))
+
+
+@pytest.fixture(scope="module")
+def model():
+    return heart_core.ModelRegistry(poll_interval=0).current
+
+
+def test_score_live_p95_within_budget(model):
+    rng = random.Random(0)
+    records = [random_record(rng) for _ in range(5000)]
+    score_live(model, records[0])
+    samples = []
+    for record in records:
+        start = time.perf_counter()
+        score_live(model, record)
+        samples.append((time.perf_counter() - start) * 1000)
+    p95 = np.percentile(samples, 95)
+    assert p95 <= LIVE_BUDGET_MS, f"score_live p95 {p95:.3f} ms is over the {LIVE_BUDGET_MS} ms budget"
+
+
+def test_score_live_matches_full_score(model):
+    record = dict(heart_core.DEFAULT_RECORD)
+    prediction, risk_score, category = score_live(model, record)
+    assert (prediction, risk_score) == model.score(record)
+    assert category == heart_core.get_risk_category(risk_score, prediction)
+
+
+def test_debouncer_runs_first_event_at_once():
+    assert Debouncer(interval=0.05).wait() == 0.0
+
+
+def test_debouncer_coalesces_a_burst():
+    debouncer = Debouncer(interval=0.05)
+    debouncer.wait()
+    waits = [debouncer.wait() for _ in range(3)]
+    # Each event in the burst waits out the interval since the previous run
+    assert all(0.0 < wait <= 0.05 for wait in waits)
+
+
+def test_debouncer_does_not_wait_after_a_quiet_period():
+    debouncer = Debouncer(interval=0.02)
+    debouncer.wait()
+    time.sleep(0.03)
+    assert debouncer.wait() == 0.0
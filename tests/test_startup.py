@@ -0,0 +1,14 @@
+"""Cold-start budget of app6.py, through benchmarks/startup_profile.py"""
+import os
+
+import startup_profile
+
+STARTUP_BUDGET_MS = float(os.environ.get("HEART_STARTUP_BUDGET_MS", 3000))
+# Deferred until a report download or a pickle fallback needs them
+DEFERRED_MODULES = ["fpdf", "joblib", "sklearn"]
+
+
+def test_cold_start_within_budget():
+    result, failures = startup_profile.run(budget_ms=STARTUP_BUDGET_MS, forbid=DEFERRED_MODULES)
+    assert not failures, failures
+    assert "load_bundle" in result["stages"]